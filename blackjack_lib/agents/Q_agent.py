@@ -1,6 +1,10 @@
 import copy
-import random
+import time
 from blackjack_lib.environment.blackjack import BlackjackEnv
+from blackjack_lib.environment.rng import spawn_rngs
+from blackjack_lib.agents.q_table import QTable, NUM_DEALER_CARDS
+from blackjack_lib.agents.checkpoint import save_checkpoint, load_checkpoint
+from blackjack_lib.agents.callbacks import CallbackList, TrainingHistory
 
 STAND = 0
 HIT = 1
@@ -13,25 +17,38 @@ class QAgent:
     def __init__(self, discount=0.95, lr_base=10.0,
                  max_hand_value=21,
                  force_ace_value=None,
-                 dealer_stick_threshold=17):  # <--- NEW PARAMETER
+                 dealer_stick_threshold=17,  # <--- NEW PARAMETER
+                 seed=None,
+                 backend='dict', dtype='float64'):
 
         self.discount = discount
         self.lr_base = lr_base
         self.max_hand_value = max_hand_value
 
+        # Exploration and the deck get independent streams derived from the seed
+        self.rng, env_rng = spawn_rngs(seed, 2)
+
         # Pass the threshold to the environment
         self.env = BlackjackEnv(max_hand_value=max_hand_value,
                                 force_ace_value=force_ace_value,
-                                dealer_stick_threshold=dealer_stick_threshold)  # <--- PASS IT
+                                dealer_stick_threshold=dealer_stick_threshold,  # <--- PASS IT
+                                seed=env_rng)
 
-        states = self._generate_states(max_hand_value)
+        # 'array' keeps Q/N in a dense QTable; Q_values/N_Q are then dict-like views
+        self.table = None
+        if backend == 'array':
+            self.use_table(QTable(max_hand_value, dtype=dtype))
+        elif backend == 'dict':
+            states = self._generate_states(max_hand_value)
 
-        self.Q_values = {}
-        self.N_Q = {}
+            self.Q_values = {}
+            self.N_Q = {}
 
-        for s in states:
-            self.Q_values[s] = [0, 0]
-            self.N_Q[s] = [0, 0]
+            for s in states:
+                self.Q_values[s] = [0, 0]
+                self.N_Q[s] = [0, 0]
+        else:
+            raise ValueError(f"Unknown Q table backend: {backend!r}")
 
         self.training_history = {
             'game_numbers': [],
@@ -39,6 +56,11 @@ class QAgent:
             'rewards': []
         }
 
+    def use_table(self, table):
+        self.table = table
+        self.Q_values = table.Q_view
+        self.N_Q = table.N_view
+
     # ... (Keep _generate_states, alpha, Q_run, pick_action, autoplay_decision exactly as they were) ...
     def _generate_states(self, max_val):
         states = [WIN_STATE, DRAW_STATE, LOSE_STATE]
@@ -51,76 +73,210 @@ class QAgent:
     def alpha(self, n):
         return self.lr_base / (9 + n)
 
-    def Q_run(self, num_simulation, epsilon=0.4, track_performance=False, eval_interval=1000):
+    def Q_run(self, num_simulation, epsilon=0.4, track_performance=False, eval_interval=1000,
+              checkpoint_path=None, checkpoint_every=None, checkpoint_seconds=None,
+              callbacks=None, planner=None):
         # ... (Same logic as provided in previous steps) ...
         # (Paste the full Q_run function from the previous response here)
+        # With checkpoint_path set, a checkpoint is written every checkpoint_every
+        # episodes and/or checkpoint_seconds of wall-clock time; QAgent.resume()
+        # continues the run from the latest one. callbacks (see agents.callbacks)
+        # are called every cb.every episodes; track_performance adds TrainingHistory.
+        # planner (e.g. dyna.PrioritizedSweeping) learns a model from every
+        # transition and runs planning backups between episodes.
+        # Returns the episodes played and which callback criterion (such as
+        # EarlyStopping) ended the run early, if any.
         if track_performance:
             self.training_history = {'game_numbers': [], 'win_rates': [], 'rewards': []}
 
-        eval_window_wins = 0
-        eval_window_rewards = 0
-        eval_window_games = 0
-
-        for simulation in range(num_simulation):
-            state = self.env.reset()
-            done = False
-            reward = 0
-            episode_reward = 0
-
-            while not done:
-                action = self.pick_action(state, epsilon)
-                next_state, next_reward, done, info = self.env.step(action)
-
-                if done:
-                    if next_reward > 0:
-                        next_state = WIN_STATE
-                    elif next_reward < 0:
-                        next_state = LOSE_STATE
-                    else:
-                        next_state = DRAW_STATE
-
-                self.N_Q[state][action] += 1
-                best_next = max(self.Q_values[next_state]) if next_state in self.Q_values else 0
-                self.Q_values[state][action] += self.alpha(self.N_Q[state][action]) * (
-                            reward + self.discount * best_next - self.Q_values[state][action])
-
-                state = next_state
-                reward = next_reward
-                episode_reward += reward
-
-                if done:
-                    if state in self.N_Q:
-                        self.N_Q[state][HIT] += 1
-                        self.N_Q[state][STAND] += 1
-                        self.Q_values[state][HIT] += self.alpha(self.N_Q[state][HIT]) * (
-                                    reward - self.Q_values[state][HIT])
-                        self.Q_values[state][STAND] += self.alpha(self.N_Q[state][STAND]) * (
-                                    reward - self.Q_values[state][STAND])
-
-                    if track_performance:
-                        eval_window_games += 1
-                        eval_window_rewards += episode_reward
-                        if episode_reward > 0: eval_window_wins += 1
-
-                        if eval_window_games >= eval_interval:
-                            win_rate = eval_window_wins / eval_window_games
-                            avg_reward = eval_window_rewards / eval_window_games
-                            self.training_history['game_numbers'].append(simulation + 1)
-                            self.training_history['win_rates'].append(win_rate)
-                            self.training_history['rewards'].append(avg_reward)
-                            eval_window_wins = 0
-                            eval_window_rewards = 0
-                            eval_window_games = 0
+        run = {
+            'num_simulation': num_simulation,
+            'epsilon': epsilon,
+            'track_performance': track_performance,
+            'eval_interval': eval_interval,
+            'episode': 0,
+            'checkpoint_path': checkpoint_path,
+            'checkpoint_every': checkpoint_every,
+            'checkpoint_seconds': checkpoint_seconds,
+        }
+        self._Q_loop(run, callbacks, planner=planner)
+        return {'episodes': run['episode'], 'stopped_by': run.get('stopped_by')}
+
+    def _Q_loop(self, run, callbacks=None, buffer_state=None, planner=None, callback_states=None):
+        epsilon = run['epsilon']
+        checkpoint_path = run['checkpoint_path']
+        checkpoint_every = run['checkpoint_every']
+        checkpoint_seconds = run['checkpoint_seconds']
+        last_checkpoint = time.monotonic()
+
+        callbacks = list(callbacks or [])
+        if run['track_performance']:
+            callbacks.insert(0, TrainingHistory(run['eval_interval']))
+        hooks = CallbackList(callbacks) if callbacks else None
+        if hooks is not None:
+            if buffer_state is not None:
+                hooks.buffer.load(*buffer_state)
+            hooks.begin(self, run['episode'], callback_states)
+
+        # The array backend trains on flat views of its arrays; the dict views
+        # are only for code outside this loop
+        if self.table is not None:
+            flat = self.table.flat_views()
+            play = lambda: self._table_episode(epsilon, planner, *flat)
+        else:
+            flat = ()
+            play = lambda: self._dict_episode(epsilon, planner)
+
+        try:
+            for simulation in range(run['episode'], run['num_simulation']):
+                episode_reward, info = play()
+
+                if planner is not None:
+                    planner.plan(self)
+
+                if hooks is not None and hooks.record(self, simulation + 1, episode_reward, info['result']):
+                    run['episode'] = simulation + 1
+                    run['stopped_by'] = hooks.stopped_by
+                    break
+
+                if checkpoint_path is not None and (
+                        (checkpoint_every and (simulation + 1) % checkpoint_every == 0) or
+                        (checkpoint_seconds and time.monotonic() - last_checkpoint >= checkpoint_seconds)):
+                    run['episode'] = simulation + 1
+                    save_checkpoint(self, checkpoint_path, run, None if hooks is None else hooks.buffer,
+                                    planner, None if hooks is None else hooks.callbacks)
+                    last_checkpoint = time.monotonic()
+            else:
+                run['episode'] = run['num_simulation']
+        finally:
+            for view in flat:
+                view.release()
+
+        if hooks is not None:
+            hooks.end(self, run['episode'])
+
+    def _dict_episode(self, epsilon, planner):
+        state = self.env.reset()
+        done = False
+        reward = 0
+        episode_reward = 0
+
+        while not done:
+            action = self.pick_action(state, epsilon)
+            next_state, next_reward, done, info = self.env.step(action)
+
+            if done:
+                if next_reward > 0:
+                    next_state = WIN_STATE
+                elif next_reward < 0:
+                    next_state = LOSE_STATE
+                else:
+                    next_state = DRAW_STATE
+
+            q, n = self.Q_values[state], self.N_Q[state]
+            n[action] += 1
+            best_next = max(self.Q_values[next_state]) if next_state in self.Q_values else 0
+            q[action] += self.alpha(n[action]) * (
+                        reward + self.discount * best_next - q[action])
+            if planner is not None:
+                planner.observe(state, action, next_state, reward)
+
+            state = next_state
+            reward = next_reward
+            episode_reward += reward
+
+            if done:
+                if state in self.N_Q:
+                    q, n = self.Q_values[state], self.N_Q[state]
+                    n[HIT] += 1
+                    n[STAND] += 1
+                    q[HIT] += self.alpha(n[HIT]) * (reward - q[HIT])
+                    q[STAND] += self.alpha(n[STAND]) * (reward - q[STAND])
+        return episode_reward, info
+
+    def _table_episode(self, epsilon, planner, Q, N):
+        # _dict_episode on the flat QTable views: state row i holds STAND at
+        # Q[2 * i] and HIT at Q[2 * i + 1]; same updates, same draws from self.rng
+        rng, alpha, discount = self.rng, self.alpha, self.discount
+        state = self.env.reset()
+        if not self.table.contains(state):
+            raise KeyError(state)
+        # Within an episode only the player's sum and ace change, so later rows
+        # are offsets from the start row (see QTable.index)
+        row = 2 * self.table.index(state)
+        dealer_row = row - 2 * ((state[0] - 2) * NUM_DEALER_CARDS * 2 + state[2])
+        done = False
+        reward = 0
+        episode_reward = 0
+
+        while not done:
+            if rng.random() < epsilon:
+                action = rng.choice([STAND, HIT])
+            else:
+                action = HIT if Q[row + HIT] >= Q[row + STAND] else STAND
+            next_state, next_reward, done, info = self.env.step(action)
+
+            if done:
+                if next_reward > 0:
+                    next_state = WIN_STATE
+                elif next_reward < 0:
+                    next_state = LOSE_STATE
+                else:
+                    next_state = DRAW_STATE
+                next_row = 2 * (1 - next_state[0])
+            else:
+                next_row = dealer_row + 2 * ((next_state[0] - 2) * NUM_DEALER_CARDS * 2 + next_state[2])
+
+            k = row + action
+            n = N[k] + 1
+            N[k] = n
+            stand_next, hit_next = Q[next_row], Q[next_row + 1]
+            q = Q[k]
+            Q[k] = q + alpha(n) * (reward + discount * (hit_next if hit_next > stand_next else stand_next) - q)
+            if planner is not None:
+                planner.observe(state, action, next_state, reward)
+
+            state, row = next_state, next_row
+            reward = next_reward
+            episode_reward += reward
+
+        for k in (row + HIT, row + STAND):
+            n = N[k] + 1
+            N[k] = n
+            Q[k] += alpha(n) * (reward - Q[k])
+        return episode_reward, info
+
+    @classmethod
+    def resume(cls, path, callbacks=None, **checkpoint_options):
+        """Load a checkpoint written by Q_run and finish the interrupted run.
+
+        ``checkpoint_options`` (checkpoint_path, checkpoint_every,
+        checkpoint_seconds) override the settings stored in the checkpoint.
+        Callbacks are not saved, so pass the same ones again to keep them
+        running; their ``state_dict`` is restored from the checkpoint, as is
+        the planner.
+        """
+        agent, run, buffer_state, planner, callback_states = load_checkpoint(path)
+        run.update(checkpoint_options)
+        if not callbacks:
+            callback_states = None
+        agent._Q_loop(run, callbacks, buffer_state, planner, callback_states)
+        return agent
 
     def pick_action(self, s, epsilon):
-        if random.random() < epsilon:
-            return random.choice([STAND, HIT])
+        if self.rng.random() < epsilon:
+            return self.rng.choice([STAND, HIT])
         else:
             return self.autoplay_decision(s)
 
     def autoplay_decision(self, state):
         if state not in self.Q_values: return HIT
-        standQ, hitQ = self.Q_values[state][STAND], self.Q_values[state][HIT]
+        standQ, hitQ = self.Q_values[state]
         if hitQ > standQ: return HIT
         if standQ > hitQ: return STAND
-        return HIT
\ No newline at end of file
+        return HIT
+
+    def export_policy(self, path):
+        """Write the greedy policy to a memory-mappable file (see agents.policy)."""
+        from blackjack_lib.agents.policy import export_policy
+        export_policy(self, path)
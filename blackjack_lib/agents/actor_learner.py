@@ -0,0 +1,245 @@
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from blackjack_lib.agents.Q_agent import STAND, HIT, WIN_STATE, DRAW_STATE, LOSE_STATE
+from blackjack_lib.agents.q_table import QTable
+from blackjack_lib.agents.callbacks import greedy_actions
+from blackjack_lib.environment.blackjack import BlackjackEnv
+from blackjack_lib.environment.card_stream import cards_needed
+from blackjack_lib.environment.rng import make_rng
+
+# Per-actor ring counters: episodes written and episodes consumed by the learner
+WRITE, READ = range(2)
+# Per-actor throughput counters: episodes produced and backpressure stalls
+PRODUCED, STALLS = range(2)
+
+
+def actor_learner_Q_run(agent, num_simulation, epsilon=0.4, num_actors=None,
+                        snapshot_every=1000, capacity=1024, seed=None):
+    """Q-learning with separate acting and learning: actors play, ``agent`` learns.
+
+    ``num_actors`` processes each play their share of ``num_simulation``
+    epsilon-greedy episodes against the latest published policy snapshot and
+    write them into their own single-producer ring of ``capacity`` episodes
+    in shared memory. This process is the only learner: it drains the rings
+    and applies the ``Q_run`` TD updates to ``agent``, and every
+    ``snapshot_every`` episodes republishes the greedy policy (actors pick
+    it up before their next episode). An actor whose ring is full waits for
+    the learner (backpressure). If an actor dies, the others are terminated
+    and RuntimeError is raised. Returns throughput stats.
+    """
+    num_actors = num_actors or max(1, multiprocessing.cpu_count() - 1)
+    table = QTable(agent.max_hand_value)
+    states = table.states()
+    max_steps = cards_needed(agent.env.num_decks, agent.max_hand_value,
+                             agent.env.force_ace_value, agent.env.dealer_stick_threshold)
+    layout = _layout(num_actors, capacity, max_steps, len(states))
+
+    shm = shared_memory.SharedMemory(create=True, size=_nbytes(layout))
+    try:
+        shared = _views(shm, layout)
+        for array in shared.values():
+            array[...] = 0
+        _publish(shared, greedy_actions(agent))
+
+        params = dict(max_hand_value=agent.max_hand_value,
+                      num_decks=agent.env.num_decks,
+                      natural_payout=agent.env.natural_payout,
+                      force_ace_value=agent.env.force_ace_value,
+                      dealer_stick_threshold=agent.env.dealer_stick_threshold)
+        quotas = [num_simulation // num_actors + (a < num_simulation % num_actors)
+                  for a in range(num_actors)]
+        seeds = np.random.SeedSequence(seed).spawn(num_actors)
+        actors = [multiprocessing.Process(target=_actor, args=(
+                      shm.name, layout, a, quotas[a], epsilon, params, seeds[a]))
+                  for a in range(num_actors)]
+
+        start = time.perf_counter()
+        try:
+            for actor in actors:
+                actor.start()
+            learner = _learn(agent, shared, states, num_simulation, snapshot_every, actors)
+            for actor in actors:
+                actor.join()
+        except BaseException:
+            for actor in actors:
+                if actor.is_alive():
+                    actor.terminate()
+            for actor in actors:
+                if actor.pid is not None:
+                    actor.join()
+            raise
+        elapsed = time.perf_counter() - start
+
+        stats = {
+            'episodes': num_simulation,
+            'num_actors': num_actors,
+            'seconds': elapsed,
+            'episodes_per_sec': num_simulation / elapsed if elapsed > 0 else float('inf'),
+            'transitions': learner['transitions'],
+            'snapshots': learner['snapshots'],
+            'learner_idle_polls': learner['idle_polls'],
+            'actor_episodes': shared['stats'][:, PRODUCED].tolist(),
+            'actor_stalls': shared['stats'][:, STALLS].tolist(),
+        }
+        del shared
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Views still referenced from an exception's traceback; the
+            # mapping goes away with them, unlinking is what matters
+            pass
+        shm.unlink()
+    return stats
+
+
+def _learn(agent, shared, states, num_simulation, snapshot_every, actors):
+    Q_values, N_Q = agent.Q_values, agent.N_Q
+    alpha, discount = agent.alpha, agent.discount
+    terminal = {1.0: WIN_STATE, 0.0: DRAW_STATE, -1.0: LOSE_STATE}
+    rings, lengths = shared['rings'], shared['lengths']
+    trajectories, actions, rewards = shared['states'], shared['actions'], shared['rewards']
+    capacity = lengths.shape[1]
+
+    learned = transitions = snapshots = idle_polls = 0
+    next_snapshot = snapshot_every
+    while learned < num_simulation:
+        progressed = False
+        for a in range(len(rings)):
+            written, read = int(rings[a, WRITE]), int(rings[a, READ])
+            for episode in range(read, written):
+                slot = episode % capacity
+                n = int(lengths[a, slot])
+                path = trajectories[a, slot, :n].tolist()
+                moves = actions[a, slot, :n].tolist()
+                reward = float(rewards[a, slot])
+
+                # The Q_run update: non-terminal steps pay 0 and the last
+                # transition leads into the WIN/DRAW/LOSE state of the result
+                for t in range(n):
+                    state, action = states[path[t]], moves[t]
+                    next_state = states[path[t + 1]] if t + 1 < n else terminal[float(np.sign(reward))]
+                    q, visits = Q_values[state], N_Q[state]
+                    visits[action] += 1
+                    q[action] += alpha(visits[action]) * (discount * max(Q_values[next_state]) - q[action])
+
+                q, visits = Q_values[next_state], N_Q[next_state]
+                visits[HIT] += 1
+                visits[STAND] += 1
+                q[HIT] += alpha(visits[HIT]) * (reward - q[HIT])
+                q[STAND] += alpha(visits[STAND]) * (reward - q[STAND])
+                transitions += n
+            if written > read:
+                rings[a, READ] = written
+                learned += written - read
+                progressed = True
+
+        if learned >= next_snapshot:
+            _publish(shared, greedy_actions(agent))
+            snapshots += 1
+            next_snapshot = (learned // snapshot_every + 1) * snapshot_every
+        if not progressed:
+            # An actor that died leaves its share unwritten forever
+            for a, actor in enumerate(actors):
+                if actor.exitcode not in (None, 0):
+                    raise RuntimeError(f"Actor {a} exited with code {actor.exitcode} "
+                                       f"after {learned} of {num_simulation} episodes")
+            idle_polls += 1
+            time.sleep(0.0005)
+
+    return {'transitions': transitions, 'snapshots': snapshots, 'idle_polls': idle_polls}
+
+
+def _actor(shm_name, layout, a, quota, epsilon, params, seed):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shared = _views(shm, layout)
+        ring, stats = shared['rings'][a], shared['stats'][a]
+        lengths, rewards = shared['lengths'][a], shared['rewards'][a]
+        trajectories, actions = shared['states'][a], shared['actions'][a]
+        capacity = lengths.shape[0]
+
+        rng = make_rng(seed)
+        env = BlackjackEnv(seed=rng, **params)
+        table = QTable(params['max_hand_value'])
+        index = table.index
+        policy, version = None, -1
+
+        for episode in range(quota):
+            # Backpressure: the ring is full until the learner catches up
+            while episode - int(ring[READ]) >= capacity:
+                stats[STALLS] += 1
+                time.sleep(0.0005)
+            policy, version = _snapshot(shared, policy, version)
+
+            slot = episode % capacity
+            state = env.reset()
+            if not table.contains(state):
+                # e.g. an ace up-card of 11; fail loudly rather than write a bad index
+                raise KeyError(state)
+            done, n, reward = False, 0, 0.0
+            while not done:
+                i = index(state)
+                if rng.random() < epsilon:
+                    action = rng.choice([STAND, HIT])
+                else:
+                    action = policy[i]
+                trajectories[slot, n] = i
+                actions[slot, n] = action
+                n += 1
+                state, reward, done, _ = env.step(action)
+            lengths[slot] = n
+            rewards[slot] = reward
+            # Publish only after the slot is complete
+            ring[WRITE] = episode + 1
+            stats[PRODUCED] += 1
+        del shared, ring, stats, lengths, rewards, trajectories, actions
+    finally:
+        shm.close()
+
+
+def _publish(shared, policy):
+    # Seqlock: an odd version means a snapshot is being written
+    version = shared['version']
+    version[0] += 1
+    shared['policy'][:] = policy
+    version[0] += 1
+
+
+def _snapshot(shared, policy, version):
+    current = int(shared['version'][0])
+    if current == version or current % 2:
+        return policy, version
+    fresh = shared['policy'].tolist()
+    if int(shared['version'][0]) != current:
+        return policy, version
+    return fresh, current
+
+
+def _layout(num_actors, capacity, max_steps, num_states):
+    return [('rings', (num_actors, 2), np.int64),
+            ('stats', (num_actors, 2), np.int64),
+            ('version', (1,), np.int64),
+            ('rewards', (num_actors, capacity), np.float64),
+            ('states', (num_actors, capacity, max_steps), np.int16),
+            ('lengths', (num_actors, capacity), np.int8),
+            ('actions', (num_actors, capacity, max_steps), np.int8),
+            ('policy', (num_states,), np.int8)]
+
+
+def _nbytes(layout):
+    return sum(_aligned(int(np.prod(shape)) * np.dtype(dtype).itemsize) for _, shape, dtype in layout)
+
+
+def _aligned(nbytes):
+    return (nbytes + 7) // 8 * 8
+
+
+def _views(shm, layout):
+    views, offset = {}, 0
+    for name, shape, dtype in layout:
+        views[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        offset += _aligned(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    return views
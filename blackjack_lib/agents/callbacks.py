@@ -0,0 +1,270 @@
+import time
+import numpy as np
+from blackjack_lib.environment.batch import RESULTS, NOT_DONE
+
+RESULT_CODES = {name: code for code, name in enumerate(RESULTS)}
+
+
+class EpisodeBuffer:
+    """Preallocated ring buffer of the last ``capacity`` episodes.
+
+    ``rewards`` holds each episode's total reward and ``outcomes`` its result
+    code (an index into ``RESULTS``); ``count`` is the number of episodes
+    recorded so far, so slot ``count % capacity`` is written next.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.outcomes = np.full(capacity, NOT_DONE, dtype=np.int8)
+        self.count = 0
+
+    def append(self, reward, outcome):
+        i = self.count % self.capacity
+        self.rewards[i] = reward
+        self.outcomes[i] = outcome
+        self.count += 1
+
+    def last(self, n):
+        """Rewards and outcomes of the last ``n`` episodes, oldest first."""
+        n = min(n, self.count, self.capacity)
+        idx = np.arange(self.count - n, self.count) % self.capacity
+        return self.rewards[idx], self.outcomes[idx]
+
+    def load(self, rewards, outcomes, count):
+        """Refill from chronological ``rewards``/``outcomes`` ending at episode ``count``."""
+        rewards, outcomes = rewards[-self.capacity:], outcomes[-self.capacity:]
+        self.count = count - len(rewards)
+        for reward, outcome in zip(rewards, outcomes):
+            self.append(reward, outcome)
+
+
+class Callback:
+    """Base class for ``Q_run`` hooks.
+
+    ``on_interval`` is called after every ``every``-th episode of the run with
+    the episode number and the ``EpisodeBuffer``, which holds at least the
+    last ``every`` episodes. Hooks read whatever else they need from the
+    agent (``Q_values``, ``N_Q``, ...). Returning a truthy value (such as a
+    reason string) from ``on_interval`` stops training after that episode.
+
+    Hooks that keep state across intervals return it from ``state_dict`` as
+    JSON-serializable values; checkpoints save it and ``load_state_dict``
+    restores it after ``on_train_begin`` when a run is resumed.
+    """
+    every = 1000
+
+    def state_dict(self):
+        return {}
+
+    def load_state_dict(self, state):
+        pass
+
+    def on_train_begin(self, agent):
+        pass
+
+    def on_interval(self, agent, episode, buffer):
+        pass
+
+    def on_train_end(self, agent, episode, buffer):
+        pass
+
+
+class TrainingHistory(Callback):
+    """Win rate and average reward per window, appended to ``agent.training_history``.
+
+    This is what ``Q_run(track_performance=True)`` installs.
+    """
+
+    def __init__(self, eval_interval=1000):
+        self.every = eval_interval
+
+    def on_interval(self, agent, episode, buffer):
+        rewards, _ = buffer.last(self.every)
+        agent.training_history['game_numbers'].append(episode)
+        agent.training_history['win_rates'].append(np.count_nonzero(rewards > 0) / len(rewards))
+        agent.training_history['rewards'].append(float(rewards.sum()) / len(rewards))
+
+
+class OutcomeRates(Callback):
+    """Per-window frequency of each result in ``RESULTS``, in ``history``."""
+
+    def __init__(self, every=1000):
+        self.every = every
+        self.history = {'game_numbers': [], **{name: [] for name in RESULTS}}
+
+    def state_dict(self):
+        return {'history': self.history}
+
+    def load_state_dict(self, state):
+        self.history = state['history']
+
+    def on_interval(self, agent, episode, buffer):
+        _, outcomes = buffer.last(self.every)
+        rates = np.bincount(outcomes, minlength=len(RESULTS)) / len(outcomes)
+        self.history['game_numbers'].append(episode)
+        for name, rate in zip(RESULTS, rates.tolist()):
+            self.history[name].append(rate)
+
+
+class PolicyChanges(Callback):
+    """Number of states whose greedy action changed since the previous call, in ``history``."""
+
+    def __init__(self, every=1000):
+        self.every = every
+        self.history = {'game_numbers': [], 'changes': []}
+        self._previous = None
+
+    def state_dict(self):
+        previous = None if self._previous is None else self._previous.tolist()
+        return {'history': self.history, 'previous': previous}
+
+    def load_state_dict(self, state):
+        self.history = state['history']
+        previous = state['previous']
+        self._previous = None if previous is None else np.array(previous, dtype=np.int8)
+
+    def on_interval(self, agent, episode, buffer):
+        policy = greedy_actions(agent)
+        if self._previous is not None:
+            self.history['game_numbers'].append(episode)
+            self.history['changes'].append(int(np.count_nonzero(policy != self._previous)))
+        self._previous = policy
+
+
+class EarlyStopping(Callback):
+    """Stop ``Q_run`` once training has converged or a budget is spent.
+
+    Checked every ``every`` episodes, in this order:
+
+    - ``max_episodes``: the run has reached this many episodes;
+    - ``max_seconds``: this much wall-clock time has passed since training began;
+    - ``patience``: the greedy policy was unchanged for this many consecutive checks;
+    - ``tol``: no Q-value moved by ``tol`` or more since the previous check.
+
+    The criterion that fired is kept in ``stopped_by`` ('episode_budget',
+    'time_budget', 'policy_stable' or 'q_converged') and the episode in
+    ``stopped_at``; ``Q_run`` also returns both.
+    """
+
+    def __init__(self, every=1000, patience=None, tol=None, max_seconds=None, max_episodes=None):
+        self.every = every
+        self.patience = patience
+        self.tol = tol
+        self.max_seconds = max_seconds
+        self.max_episodes = max_episodes
+        self.stopped_by = None
+        self.stopped_at = None
+
+    def on_train_begin(self, agent):
+        self._start = time.monotonic()
+        self._previous = None
+        self._stable_checks = 0
+        self.stopped_by = None
+        self.stopped_at = None
+
+    def state_dict(self):
+        # The time budget counts the seconds trained before the checkpoint
+        return {
+            'elapsed': time.monotonic() - self._start,
+            'previous': None if self._previous is None else self._previous.tolist(),
+            'dtype': None if self._previous is None else self._previous.dtype.name,
+            'stable_checks': self._stable_checks,
+        }
+
+    def load_state_dict(self, state):
+        self._start = time.monotonic() - state['elapsed']
+        previous = state['previous']
+        self._previous = None if previous is None else np.array(previous, dtype=state['dtype'])
+        self._stable_checks = state['stable_checks']
+
+    def on_interval(self, agent, episode, buffer):
+        if self.max_episodes is not None and episode >= self.max_episodes:
+            return self._stop('episode_budget', episode)
+        if self.max_seconds is not None and time.monotonic() - self._start >= self.max_seconds:
+            return self._stop('time_budget', episode)
+
+        Q = q_array(agent).copy()
+        previous, self._previous = self._previous, Q
+        if previous is None:
+            return None
+        if self.patience is not None:
+            unchanged = np.array_equal(_greedy(Q), _greedy(previous))
+            self._stable_checks = self._stable_checks + 1 if unchanged else 0
+            if self._stable_checks >= self.patience:
+                return self._stop('policy_stable', episode)
+        if self.tol is not None and np.abs(Q - previous).max() < self.tol:
+            return self._stop('q_converged', episode)
+        return None
+
+    def _stop(self, reason, episode):
+        self.stopped_by = reason
+        self.stopped_at = episode
+        return reason
+
+
+def q_array(agent):
+    """``agent``'s Q-values as a ``(num_states, 2)`` array in ``Q_values`` order.
+
+    With the array backend this is the live table, not a copy.
+    """
+    if agent.table is not None:
+        return agent.table.Q
+    return np.array(list(agent.Q_values.values()), dtype=np.float64)
+
+
+def greedy_actions(agent):
+    """``autoplay_decision`` for every state in ``agent.Q_values``, as an int8 array."""
+    return _greedy(q_array(agent))
+
+
+def _greedy(Q):
+    # Ties go to HIT, like autoplay_decision
+    return (Q[:, 1] >= Q[:, 0]).astype(np.int8)
+
+
+class CallbackList:
+    """Dispatches ``Q_run`` episodes to a list of callbacks.
+
+    Only built when at least one callback is registered; the buffer is sized
+    to the longest interval.
+    """
+
+    def __init__(self, callbacks):
+        self.callbacks = list(callbacks)
+        self.buffer = EpisodeBuffer(max(cb.every for cb in self.callbacks))
+        self.next_due = 0
+        self.stopped_by = None
+
+    def begin(self, agent, episode, states=None):
+        """Start the callbacks, restoring the ``states`` a checkpoint saved for them."""
+        if states is not None:
+            saved = [state['type'] for state in states]
+            if saved != [type(cb).__name__ for cb in self.callbacks]:
+                raise ValueError(f"Checkpoint has state for callbacks {saved}; "
+                                 "pass the same callbacks to resume")
+        for i, cb in enumerate(self.callbacks):
+            cb.on_train_begin(agent)
+            if states is not None:
+                cb.load_state_dict(states[i]['state'])
+        self._schedule(episode)
+
+    def record(self, agent, episode, reward, result):
+        """Log one episode and run the callbacks that are due; True means stop."""
+        self.buffer.append(reward, RESULT_CODES[result])
+        if episode >= self.next_due:
+            for cb in self.callbacks:
+                if episode % cb.every == 0:
+                    stop = cb.on_interval(agent, episode, self.buffer)
+                    if stop and self.stopped_by is None:
+                        self.stopped_by = stop if isinstance(stop, str) else type(cb).__name__
+            self._schedule(episode)
+            return self.stopped_by is not None
+        return False
+
+    def end(self, agent, episode):
+        for cb in self.callbacks:
+            cb.on_train_end(agent, episode, self.buffer)
+
+    def _schedule(self, episode):
+        self.next_due = min((episode // cb.every + 1) * cb.every for cb in self.callbacks)
@@ -0,0 +1,168 @@
+import os
+import json
+import random
+from array import array
+import numpy as np
+from blackjack_lib.environment.rng import GlobalRandom, GeneratorRandom
+
+# Checkpoints are .npz archives: Q/N in QTable.states() order, the training
+# history, the callback episode buffer, the shoe, the planner's arrays and a
+# JSON header (agent config, run progress, random states, callback states).
+# Nothing is pickled, so loading never runs code from the file.
+FORMAT_VERSION = 4
+HISTORY_KEYS = ('game_numbers', 'win_rates', 'rewards')
+PLANNER_PREFIX = 'planner_'
+
+
+def save_checkpoint(agent, path, run, buffer=None, planner=None, callbacks=None):
+    """Atomically write ``agent``'s learning state and ``run`` progress to ``path``.
+
+    ``run`` is the dict ``QAgent.Q_run`` keeps its loop state in, ``buffer``
+    the ``EpisodeBuffer`` of its callbacks, ``planner`` its model-based
+    planner, if any, and ``callbacks`` the callbacks whose ``state_dict`` is
+    saved. The file is written next to ``path`` and renamed over it, so an
+    interrupted save leaves the previous checkpoint intact.
+    """
+    env, deck = agent.env, agent.env.deck
+    states = list(agent.Q_values)
+    header = {
+        'version': FORMAT_VERSION,
+        'agent': {
+            'discount': agent.discount,
+            'lr_base': agent.lr_base,
+            'max_hand_value': agent.max_hand_value,
+            'force_ace_value': env.force_ace_value,
+            'dealer_stick_threshold': env.dealer_stick_threshold,
+            'backend': 'dict' if agent.table is None else 'array',
+            'dtype': 'float64' if agent.table is None else agent.table.Q.dtype.name,
+        },
+        'run': run,
+        'buffer_count': None if buffer is None else buffer.count,
+        'deck': {'position': deck.position, 'rank_counts': deck.rank_counts,
+                 'cut_card': deck.cut_card},
+        # A stream shared by the agent and the deck is saved once and stays shared
+        'rng': {
+            'agent': _rng_state(agent.rng),
+            'deck': None if deck.rng is agent.rng else _rng_state(deck.rng),
+        },
+        'planner': None if planner is None else {
+            'max_hand_value': planner.max_hand_value,
+            'planning_steps': planner.planning_steps,
+            'theta': planner.theta,
+            'plan_every': planner.plan_every,
+        },
+        'callbacks': None if callbacks is None else [
+            {'type': type(cb).__name__, 'state': cb.state_dict()} for cb in callbacks],
+    }
+
+    arrays = {
+        'header': np.frombuffer(json.dumps(header).encode(), dtype=np.uint8),
+        'deck_codes': np.frombuffer(deck.codes.tobytes(), dtype=np.uint8),
+        'Q': np.array([agent.Q_values[s] for s in states],
+                      dtype=np.float64 if agent.table is None else agent.table.Q.dtype),
+        'N': np.array([agent.N_Q[s] for s in states], dtype=np.int64),
+    }
+    for key in HISTORY_KEYS:
+        arrays[f'history_{key}'] = np.asarray(agent.training_history[key])
+    if buffer is not None:
+        arrays['buffer_rewards'], arrays['buffer_outcomes'] = buffer.last(buffer.capacity)
+    if planner is not None:
+        for key, value in planner.state_dict().items():
+            arrays[PLANNER_PREFIX + key] = value
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """Rebuild the ``QAgent``, run dict, episode buffer, planner and callback states saved by ``save_checkpoint``.
+
+    The buffer comes back as ``(rewards, outcomes, count)`` for
+    ``EpisodeBuffer.load``, or ``None`` if the run had no callbacks; the
+    planner is ``None`` if the run had none. Callback states are a list of
+    ``{'type': class name, 'state': state_dict}`` in callback order, or
+    ``None``.
+    """
+    from blackjack_lib.agents.Q_agent import QAgent
+    from blackjack_lib.agents.dyna import PrioritizedSweeping
+
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(data['header'].tobytes().decode())
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f"{path} has checkpoint version {header['version']}, "
+                             f"expected {FORMAT_VERSION}")
+        deck_codes = data['deck_codes'].tobytes()
+        Q, N = data['Q'], data['N']
+        history = {key: data[f'history_{key}'].tolist() for key in HISTORY_KEYS}
+        buffer_state = None
+        if header['buffer_count'] is not None:
+            buffer_state = (data['buffer_rewards'], data['buffer_outcomes'], header['buffer_count'])
+        planner_state = {key[len(PLANNER_PREFIX):]: data[key] for key in data.files
+                         if key.startswith(PLANNER_PREFIX)}
+
+    agent = QAgent(**header['agent'])
+    states = list(agent.Q_values)
+    if len(states) != len(Q):
+        raise ValueError(f"{path} does not match the agent's state space")
+    if agent.table is not None:
+        agent.table.Q[:] = Q
+        agent.table.N[:] = N
+    else:
+        for state, q, n in zip(states, Q.tolist(), N.tolist()):
+            agent.Q_values[state] = q
+            agent.N_Q[state] = n
+    agent.training_history = history
+
+    deck = agent.env.deck
+    deck.codes = array('B', deck_codes)
+    deck.position = header['deck']['position']
+    deck.rank_counts = header['deck']['rank_counts']
+    deck.cut_card = header['deck']['cut_card']
+
+    agent.rng = _restore_rng(header['rng']['agent'])
+    deck_rng = header['rng']['deck']
+    deck.rng = agent.rng if deck_rng is None else _restore_rng(deck_rng)
+
+    planner = None
+    if header['planner'] is not None:
+        planner = PrioritizedSweeping(**header['planner'])
+        planner.load_state_dict(planner_state)
+
+    return agent, header['run'], buffer_state, planner, header['callbacks']
+
+
+def _rng_state(rng):
+    # JSON description of a make_rng source: random.Random/GlobalRandom
+    # states are (version, 625 ints, gauss_next) tuples and numpy ones are
+    # bit_generator.state dicts (MT19937 keeps an array in there)
+    if isinstance(rng, GlobalRandom):
+        return {'kind': 'global', 'state': random.getstate()}
+    if isinstance(rng, GeneratorRandom):
+        state = rng.getstate()
+        return {'kind': 'generator', 'state': {
+            key: {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in value.items()}
+            if isinstance(value, dict) else value
+            for key, value in state.items()}}
+    if isinstance(rng, random.Random):
+        return {'kind': 'random', 'state': rng.getstate()}
+    raise TypeError(f"Cannot checkpoint random source {rng!r}")
+
+
+def _restore_rng(saved):
+    kind, state = saved['kind'], saved['state']
+    if kind == 'generator':
+        rng = GeneratorRandom(np.random.Generator(getattr(np.random, state['bit_generator'])()))
+        rng.setstate(state)
+        return rng
+    version, internal, gauss_next = state
+    state = (version, tuple(internal), gauss_next)
+    if kind == 'global':
+        random.setstate(state)
+        return GlobalRandom()
+    rng = random.Random()
+    rng.setstate(state)
+    return rng
@@ -0,0 +1,180 @@
+import heapq
+import numpy as np
+from blackjack_lib.agents.q_table import QTable
+
+
+class PrioritizedSweeping:
+    """Dyna-style planner for ``QAgent.Q_run(planner=...)``.
+
+    Every real transition ``Q_run`` learns from is also counted into a
+    sparse empirical model. Pair ``k = 2 * s + a`` (state indices follow
+    ``QTable``) has ``successors[k]``, a dict of next state -> count,
+    ``visits[k]`` and ``reward_totals[k]``. Every ``plan_every`` real
+    episodes, up to ``planning_steps`` expected backups per episode
+
+        Q(s, a) = (reward_totals[k] + discount * sum(count * V[s'])) / visits[k]
+
+    are applied to the agent's table, highest priority first, summing only
+    over the successors actually observed. The pairs seen since the last sweep are
+    queued with priority ``|backup - Q(s, a)|``. When a backup changes
+    ``V(s)`` by ``delta``, each pair observed leading into ``s`` is queued with
+    ``P(s | pair) * delta``. Pairs whose priority is at most ``theta`` are not
+    queued.
+
+    ``planning_steps`` caps the backups per episode (0 only learns the
+    model). Sweeping in batches lets the queue merge the repeats of common
+    pairs; the episodes after a run's last full batch are not planned for.
+    """
+
+    def __init__(self, max_hand_value=21, planning_steps=10, theta=1e-4, plan_every=1000):
+        if planning_steps < 0:
+            raise ValueError(f"planning_steps must be >= 0, got {planning_steps!r}")
+        if plan_every < 1:
+            raise ValueError(f"plan_every must be >= 1, got {plan_every!r}")
+        self.max_hand_value = max_hand_value
+        self.planning_steps = planning_steps
+        self.plan_every = plan_every
+        self.theta = theta
+        self.states = QTable(max_hand_value).states()
+        self.index = {state: i for i, state in enumerate(self.states)}
+
+        num_states = len(self.states)
+        self.successors = [{} for _ in range(2 * num_states)]
+        self.visits = [0] * (2 * num_states)
+        self.reward_totals = [0.0] * (2 * num_states)
+        self.values = [0.0] * num_states
+        # Pairs k observed leading into each state
+        self.predecessors = [[] for _ in range(num_states)]
+        self.backups = 0
+        self.episodes = 0
+
+        # Max-heap of (-priority, k); _priority holds each queued pair's
+        # current priority so superseded heap entries are skipped when popped
+        self._queue = []
+        self._priority = {}
+        self._observed = set()
+
+    def observe(self, state, action, next_state, reward):
+        """Count one transition (called by ``Q_run`` after each TD update)."""
+        i, j = self.index.get(state), self.index.get(next_state)
+        if i is None or j is None:
+            return
+        k = 2 * i + action
+        successors = self.successors[k]
+        count = successors.get(j)
+        if count is None:
+            self.predecessors[j].append(k)
+            count = 0
+        successors[j] = count + 1
+        self.visits[k] += 1
+        self.reward_totals[k] += reward
+        self._observed.add((k, j))
+
+    def plan(self, agent):
+        """Count an episode; every ``plan_every`` episodes queue their pairs and sweep."""
+        self.episodes += 1
+        if self.episodes % self.plan_every:
+            return
+        if agent.table is not None:
+            # Flat Q as in QTable.flat_views: pair k is element k
+            Q = memoryview(agent.table.Q.reshape(-1))
+            row = lambda i: Q[2 * i:2 * i + 2]
+        else:
+            Q_values, states = agent.Q_values, self.states
+            row = lambda i: Q_values[states[i]]
+        try:
+            self._sweep(row, agent.discount)
+        finally:
+            if agent.table is not None:
+                Q.release()
+
+    def state_dict(self):
+        """Model, queue and counters as flat arrays (the lists of dicts as CSR)."""
+        queue = self._queue
+        return {
+            'successor_offsets': _offsets(self.successors),
+            'successor_states': np.array([j for s in self.successors for j in s], dtype=np.int64),
+            'successor_counts': np.array([c for s in self.successors for c in s.values()], dtype=np.int64),
+            'predecessor_offsets': _offsets(self.predecessors),
+            'predecessor_pairs': np.array([k for p in self.predecessors for k in p], dtype=np.int64),
+            'visits': np.array(self.visits, dtype=np.int64),
+            'reward_totals': np.array(self.reward_totals, dtype=np.float64),
+            'values': np.array(self.values, dtype=np.float64),
+            'queue_priorities': np.array([p for p, _ in queue], dtype=np.float64),
+            'queue_pairs': np.array([k for _, k in queue], dtype=np.int64),
+            'priority_pairs': np.array(list(self._priority), dtype=np.int64),
+            'priority_values': np.array(list(self._priority.values()), dtype=np.float64),
+            'observed': np.array(sorted(self._observed), dtype=np.int64).reshape(-1, 2),
+            'counters': np.array([self.backups, self.episodes], dtype=np.int64),
+        }
+
+    def load_state_dict(self, state):
+        """Restore what ``state_dict`` returned, for a planner built with the same arguments."""
+        if len(state['visits']) != len(self.visits):
+            raise ValueError("Planner state does not match the state space")
+        counts = state['successor_counts'].tolist()
+        states = state['successor_states'].tolist()
+        offsets = state['successor_offsets'].tolist()
+        self.successors = [dict(zip(states[a:b], counts[a:b])) for a, b in zip(offsets, offsets[1:])]
+        pairs = state['predecessor_pairs'].tolist()
+        offsets = state['predecessor_offsets'].tolist()
+        self.predecessors = [pairs[a:b] for a, b in zip(offsets, offsets[1:])]
+        self.visits = state['visits'].tolist()
+        self.reward_totals = state['reward_totals'].tolist()
+        self.values = state['values'].tolist()
+        # Kept in heap order, so no re-heapify
+        self._queue = list(zip(state['queue_priorities'].tolist(), state['queue_pairs'].tolist()))
+        self._priority = dict(zip(state['priority_pairs'].tolist(), state['priority_values'].tolist()))
+        self._observed = set(map(tuple, state['observed'].tolist()))
+        self.backups, self.episodes = state['counters'].tolist()
+
+    def _sweep(self, row, discount):
+        values, visits, successors = self.values, self.visits, self.successors
+        theta = self.theta
+
+        # Q_run moved the values of every state it visited since the last sweep
+        for k, j in self._observed:
+            values[k >> 1] = max(row(k >> 1))
+            values[j] = max(row(j))
+        for k, _ in self._observed:
+            self._push(k, abs(self._backup(discount, k) - row(k >> 1)[k & 1]))
+        self._observed.clear()
+
+        for _ in range(self.planning_steps * self.plan_every):
+            k = self._pop()
+            if k is None:
+                break
+            i = k >> 1
+            q = row(i)
+            q[k & 1] = self._backup(discount, k)
+            value = max(q)
+            delta = abs(value - values[i])
+            values[i] = value
+            self.backups += 1
+            if delta > theta:
+                for p in self.predecessors[i]:
+                    self._push(p, successors[p][i] * delta / visits[p])
+
+    def _backup(self, discount, k):
+        values = self.values
+        expected = 0.0
+        for j, count in self.successors[k].items():
+            expected += count * values[j]
+        return (self.reward_totals[k] + discount * expected) / self.visits[k]
+
+    def _push(self, k, priority):
+        if priority > self.theta and priority > self._priority.get(k, 0.0):
+            self._priority[k] = priority
+            heapq.heappush(self._queue, (-priority, k))
+
+    def _pop(self):
+        while self._queue:
+            priority, k = heapq.heappop(self._queue)
+            if self._priority.get(k) == -priority:
+                del self._priority[k]
+                return k
+        return None
+
+
+def _offsets(rows):
+    return np.cumsum([0] + [len(row) for row in rows], dtype=np.int64)
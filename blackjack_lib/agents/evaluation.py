@@ -0,0 +1,211 @@
+from statistics import NormalDist
+import numpy as np
+from blackjack_lib.agents.Q_agent import HIT
+from blackjack_lib.environment.card_stream import cards_needed, generate_card_stream
+from blackjack_lib.environment.batch import (BatchBlackjackEnv, PLAYER_BUST, DEALER_BUST,
+                                             PLAYER_WIN, DEALER_WIN, DRAW)
+
+
+def policy_array(agent):
+    """Greedy policy of ``agent`` as ``policy[player_sum, dealer_card, usable_ace]``.
+
+    Entries agree with ``agent.autoplay_decision`` (HIT for unknown states
+    and ties). Player sums above ``max_hand_value`` share the last row.
+    """
+    env = agent.env
+    max_dealer_card = max(env.card_values)
+    policy = np.full((agent.max_hand_value + 2, max_dealer_card + 1, 2), HIT, dtype=np.int8)
+    for state in agent.Q_values:
+        player_sum, dealer_card, usable_ace = state
+        if 2 <= player_sum <= agent.max_hand_value and dealer_card <= max_dealer_card:
+            policy[player_sum, dealer_card, int(usable_ace)] = agent.autoplay_decision(state)
+    return policy
+
+
+def batch_env_for(agent, num_envs, seed=None, **kwargs):
+    """A ``BatchBlackjackEnv`` with the same rules as ``agent.env``."""
+    env = agent.env
+    return BatchBlackjackEnv(num_envs, num_decks=env.num_decks,
+                             natural_payout=env.natural_payout,
+                             max_hand_value=env.max_hand_value,
+                             force_ace_value=env.force_ace_value,
+                             dealer_stick_threshold=env.dealer_stick_threshold,
+                             seed=seed, **kwargs)
+
+
+def play_policy(policy, env):
+    """Play one batch of games on ``env`` with a policy lookup array.
+
+    Returns per-game total rewards and result codes.
+    """
+    state = env.reset()
+    total_rewards = np.zeros(env.num_envs)
+    last_row = policy.shape[0] - 1
+    while not env.done.all():
+        actions = policy[np.minimum(state[:, 0], last_row), state[:, 1], state[:, 2]]
+        state, rewards, _, info = env.step(actions)
+        total_rewards += rewards
+    return total_rewards, info['result']
+
+
+def evaluate_policy(agent, num_games=10000, eval_interval=None, batch_size=100000, seed=None,
+                    card_stream=None):
+    """Play ``num_games`` greedy games in batches.
+
+    Returns the outcome counts used by ``evaluate_Q`` (wins, losses, draws,
+    player_busts, dealer_busts), ``win_rate``, ``avg_reward`` and, when
+    ``eval_interval`` is given, a ``history`` dict of per-window win rates and
+    average rewards in the ``training_history`` layout. With ``card_stream``
+    (from ``generate_card_stream``) the games replay its first ``num_games``
+    rows instead of dealing from ``seed``.
+    """
+    rewards, results = _play_games(policy_array(agent), agent, num_games, batch_size,
+                                   seed, card_stream)
+    summary = _summarize(rewards, results)
+    if eval_interval:
+        summary['history'] = windowed_history(rewards, eval_interval)
+    return summary
+
+
+def sequential_evaluate(agent, half_width=0.01, target='win_rate', confidence=0.95,
+                        batch_size=10000, max_games=1000000, seed=None):
+    """Play greedy games in batches until the confidence interval is tight enough.
+
+    After each batch a Wilson interval for the win rate and a normal interval
+    for the average reward are computed at ``confidence``; play stops once
+    the half-width of the ``target`` interval ('win_rate', 'avg_reward' or
+    'both') is at most ``half_width``, or after ``max_games``. Returns the
+    ``evaluate_policy`` summary plus ``win_rate_ci``/``avg_reward_ci`` as
+    ``(low, high)``, ``games`` and ``stopped_by`` ('half_width' or 'max_games').
+    """
+    if target not in ('win_rate', 'avg_reward', 'both'):
+        raise ValueError(f"Unknown target: {target!r}")
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    policy = policy_array(agent)
+    env = batch_env_for(agent, min(batch_size, max_games), seed=seed)
+
+    rewards, results = [], []
+    games = wins = 0
+    reward_sum = reward_sq_sum = 0.0
+    while True:
+        batch_rewards, batch_results = play_policy(policy, env)
+        take = min(env.num_envs, max_games - games)
+        batch_rewards, batch_results = batch_rewards[:take], batch_results[:take]
+        rewards.append(batch_rewards)
+        results.append(batch_results)
+        games += take
+        wins += int(np.count_nonzero(batch_rewards > 0))
+        reward_sum += float(batch_rewards.sum())
+        reward_sq_sum += float(np.square(batch_rewards).sum())
+
+        win_rate_ci = wilson_interval(wins, games, z)
+        mean = reward_sum / games
+        variance = max(reward_sq_sum / games - mean * mean, 0.0) * games / max(games - 1, 1)
+        avg_reward_ci = normal_interval(mean, variance, games, z)
+
+        widths = {'win_rate': (win_rate_ci[1] - win_rate_ci[0]) / 2,
+                  'avg_reward': (avg_reward_ci[1] - avg_reward_ci[0]) / 2}
+        widths['both'] = max(widths['win_rate'], widths['avg_reward'])
+        if widths[target] <= half_width:
+            stopped_by = 'half_width'
+            break
+        if games >= max_games:
+            stopped_by = 'max_games'
+            break
+
+    summary = _summarize(np.concatenate(rewards), np.concatenate(results))
+    summary.update(win_rate_ci=win_rate_ci, avg_reward_ci=avg_reward_ci,
+                   games=games, stopped_by=stopped_by)
+    return summary
+
+
+def wilson_interval(successes, n, z):
+    """Wilson score interval for a binomial proportion."""
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return float(center - margin), float(center + margin)
+
+
+def normal_interval(mean, variance, n, z):
+    """Normal-approximation interval for a mean."""
+    margin = z * np.sqrt(variance / n)
+    return float(mean - margin), float(mean + margin)
+
+
+def compare_policies(agents, num_games=10000, batch_size=100000, seed=None, baseline=0):
+    """Evaluate ``agents`` on common random numbers and pair them against ``baseline``.
+
+    One seeded card stream is generated (wide enough for every agent's rules;
+    all agents must play the same number of decks) and replayed to every
+    agent, so each game is played from the same cards by all of them and
+    the per-game reward differences cancel most of the dealing noise.
+    Returns a list with each agent's ``evaluate_policy`` summary extended by
+    ``reward_diff``/``reward_diff_se`` and ``win_rate_diff``/``win_rate_diff_se``:
+    the paired mean difference to the baseline agent and its standard error.
+    """
+    num_decks = {agent.env.num_decks for agent in agents}
+    if len(num_decks) != 1:
+        raise ValueError("Common random numbers need every agent to use the same number of decks")
+    num_decks = num_decks.pop()
+    width = max(cards_needed(num_decks, max_hand_value=agent.env.max_hand_value,
+                             force_ace_value=agent.env.force_ace_value,
+                             dealer_stick_threshold=agent.env.dealer_stick_threshold)
+                for agent in agents)
+    card_stream = generate_card_stream(num_games, num_decks, width=width, seed=seed)
+
+    played = [_play_games(policy_array(agent), agent, num_games, batch_size, None, card_stream)
+              for agent in agents]
+    base_rewards = played[baseline][0]
+    summaries = []
+    for rewards, results in played:
+        summary = _summarize(rewards, results)
+        for name, values, base in (('reward', rewards, base_rewards),
+                                   ('win_rate', rewards > 0, base_rewards > 0)):
+            diff = values.astype(np.float64) - base
+            summary[f'{name}_diff'] = float(diff.mean())
+            summary[f'{name}_diff_se'] = float(diff.std(ddof=1) / np.sqrt(num_games)) if num_games > 1 else 0.0
+        summaries.append(summary)
+    return summaries
+
+
+def _play_games(policy, agent, num_games, batch_size, seed, card_stream):
+    env = batch_env_for(agent, min(batch_size, num_games), seed=seed)
+    rewards, results = [], []
+    played = 0
+    while played < num_games:
+        take = min(env.num_envs, num_games - played)
+        if card_stream is not None:
+            if take != env.num_envs:
+                env = batch_env_for(agent, take, seed=seed)
+            env.use_card_stream(card_stream[played:played + take])
+        batch_rewards, batch_results = play_policy(policy, env)
+        rewards.append(batch_rewards[:take])
+        results.append(batch_results[:take])
+        played += take
+    return np.concatenate(rewards), np.concatenate(results)
+
+
+def _summarize(rewards, results):
+    counts = np.bincount(results, minlength=DRAW + 1)
+    return {
+        'wins': int(counts[DEALER_BUST] + counts[PLAYER_WIN]),
+        'losses': int(counts[PLAYER_BUST] + counts[DEALER_WIN]),
+        'draws': int(counts[DRAW]),
+        'player_busts': int(counts[PLAYER_BUST]),
+        'dealer_busts': int(counts[DEALER_BUST]),
+        'win_rate': float(np.mean(rewards > 0)),
+        'avg_reward': float(rewards.mean()),
+    }
+
+
+def windowed_history(rewards, eval_interval, start_game_num=0):
+    """Win rate and average reward over each complete window of games."""
+    num_windows = len(rewards) // eval_interval
+    windows = rewards[:num_windows * eval_interval].reshape(num_windows, eval_interval)
+    return {
+        'game_numbers': [start_game_num + (k + 1) * eval_interval for k in range(num_windows)],
+        'win_rates': (windows > 0).mean(axis=1).tolist(),
+        'rewards': windows.mean(axis=1).tolist(),
+    }
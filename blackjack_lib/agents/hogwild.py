@@ -0,0 +1,112 @@
+import copy
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from blackjack_lib.agents.Q_agent import QAgent
+from blackjack_lib.agents.q_table import QTable
+
+
+def parallel_Q_run(agent, num_simulation, epsilon=0.4, num_workers=None, seed=None):
+    """Hogwild-style Q-learning: ``num_workers`` processes train one shared Q table.
+
+    ``agent.Q_values`` and ``agent.N_Q`` are copied into a ``QTable`` backed
+    by shared memory and every worker runs ``Q_run`` on its own
+    ``BlackjackEnv`` against that table, so TD updates land without locks
+    (an occasional lost update is the accepted price). Worker seeds are
+    spawned from ``seed``. The merged table is written back into ``agent``;
+    returns timing stats: the overall episodes per second (pool start-up
+    included) and each worker's own rate in ``worker_episodes_per_sec``.
+    ``hogwild_scaling`` compares these across worker counts.
+    """
+    num_workers = num_workers or multiprocessing.cpu_count()
+    template = QTable(agent.max_hand_value)
+
+    q_shm = shared_memory.SharedMemory(create=True, size=template.Q.nbytes)
+    n_shm = shared_memory.SharedMemory(create=True, size=template.N.nbytes)
+    try:
+        table = _shared_table(agent.max_hand_value, q_shm, n_shm)
+        table.load(agent.Q_values, agent.N_Q)
+
+        params = dict(discount=agent.discount, lr_base=agent.lr_base,
+                      max_hand_value=agent.max_hand_value,
+                      force_ace_value=agent.env.force_ace_value,
+                      dealer_stick_threshold=agent.env.dealer_stick_threshold)
+        episodes = [num_simulation // num_workers + (w < num_simulation % num_workers)
+                    for w in range(num_workers)]
+        seeds = np.random.SeedSequence(seed).spawn(num_workers)
+        jobs = [(q_shm.name, n_shm.name, params, episodes[w], epsilon, seeds[w])
+                for w in range(num_workers)]
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(num_workers) as pool:
+            worker_seconds = pool.map(_hogwild_worker, jobs)
+        elapsed = time.perf_counter() - start
+
+        if agent.table is not None:
+            agent.table.Q[:] = table.Q
+            agent.table.N[:] = table.N
+        else:
+            for i, s in enumerate(table.states()):
+                agent.Q_values[s] = table.Q[i].tolist()
+                agent.N_Q[s] = table.N[i].tolist()
+        del table
+    finally:
+        for shm in (q_shm, n_shm):
+            shm.close()
+            shm.unlink()
+
+    return {
+        'episodes': num_simulation,
+        'num_workers': num_workers,
+        'seconds': elapsed,
+        'episodes_per_sec': num_simulation / elapsed if elapsed > 0 else float('inf'),
+        'worker_seconds': worker_seconds,
+        'worker_episodes_per_sec': [n / t if t > 0 else float('inf')
+                                    for n, t in zip(episodes, worker_seconds)],
+    }
+
+
+def hogwild_scaling(agent, num_simulation, worker_counts=None, epsilon=0.4, seed=None):
+    """Throughput of ``parallel_Q_run`` on copies of ``agent`` for each worker count.
+
+    ``worker_counts`` defaults to 1, 2, 4, ... up to the number of CPUs. Every
+    count trains a fresh copy for ``num_simulation`` episodes; returns one
+    ``parallel_Q_run`` stats dict per count with ``speedup`` over the first
+    count's episodes per second added. ``agent`` itself is not trained.
+    """
+    if worker_counts is None:
+        cpus = multiprocessing.cpu_count()
+        worker_counts = [2 ** k for k in range(cpus.bit_length()) if 2 ** k <= cpus]
+    results = []
+    for num_workers in worker_counts:
+        stats = parallel_Q_run(copy.deepcopy(agent), num_simulation, epsilon=epsilon,
+                               num_workers=num_workers, seed=seed)
+        stats['speedup'] = stats['episodes_per_sec'] / results[0]['episodes_per_sec'] if results else 1.0
+        results.append(stats)
+    return results
+
+
+def _shared_table(max_hand_value, q_shm, n_shm):
+    template = QTable(max_hand_value)
+    return QTable(max_hand_value,
+                  Q=np.ndarray(template.Q.shape, dtype=template.Q.dtype, buffer=q_shm.buf),
+                  N=np.ndarray(template.N.shape, dtype=template.N.dtype, buffer=n_shm.buf))
+
+
+def _hogwild_worker(job):
+    q_name, n_name, params, num_episodes, epsilon, seed = job
+    q_shm = shared_memory.SharedMemory(name=q_name)
+    n_shm = shared_memory.SharedMemory(name=n_name)
+    try:
+        table = _shared_table(params['max_hand_value'], q_shm, n_shm)
+        worker = QAgent(seed=seed, **params)
+        worker.use_table(table)
+        start = time.perf_counter()
+        worker.Q_run(num_episodes, epsilon=epsilon)
+        seconds = time.perf_counter() - start
+        del worker, table
+    finally:
+        q_shm.close()
+        n_shm.close()
+    return seconds
@@ -0,0 +1,123 @@
+import mmap
+import os
+import struct
+import numpy as np
+from blackjack_lib.agents.Q_agent import HIT, WIN_STATE, DRAW_STATE, LOSE_STATE
+from blackjack_lib.agents.evaluation import policy_array
+
+# File layout: fixed little-endian header (ending with the decisions in the
+# WIN, DRAW and LOSE states), then one action byte per state of
+# policy[player_sum, dealer_card, usable_ace] in C order
+MAGIC = b'BJPOLICY'
+VERSION = 2
+HEADER = struct.Struct('<8sHhhhhHHH3b')
+NO_FORCED_ACE = -1
+TERMINAL_STATES = (WIN_STATE, DRAW_STATE, LOSE_STATE)
+
+
+def export_policy(agent, path):
+    """Write the agent's greedy policy and the env's rules to a policy file."""
+    policy = policy_array(agent)
+    env = agent.env
+    force_ace_value = NO_FORCED_ACE if env.force_ace_value is None else env.force_ace_value
+    terminal = [agent.autoplay_decision(state) for state in TERMINAL_STATES]
+    header = HEADER.pack(MAGIC, VERSION, env.max_hand_value, force_ace_value,
+                         env.dealer_stick_threshold, env.num_decks, *policy.shape, *terminal)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(policy.tobytes())
+    compiled = CompiledPolicy(tmp_path)
+    try:
+        compiled.check_agent(agent)
+    finally:
+        compiled.close()
+    os.replace(tmp_path, path)
+
+
+class CompiledPolicy:
+    """Read-only, memory-mapped greedy policy produced by ``export_policy``.
+
+    Processes that map the same file share its pages. ``decision(state)``
+    matches ``QAgent.autoplay_decision`` for the exporting agent and
+    ``policy`` is a zero-copy array view usable with ``play_policy``.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path} is too short to be a policy file")
+
+        magic, version, max_hand_value, force_ace_value, threshold, num_decks, *fields = \
+            HEADER.unpack_from(self._mmap)
+        shape, terminal = fields[:3], fields[3:]
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a policy file")
+        if version != VERSION:
+            raise ValueError(f"{path} has policy format version {version}, expected {VERSION}")
+        if len(self._mmap) != HEADER.size + int(np.prod(shape)):
+            raise ValueError(f"{path} is truncated")
+
+        self.rules = {
+            'max_hand_value': max_hand_value,
+            'force_ace_value': None if force_ace_value == NO_FORCED_ACE else force_ace_value,
+            'dealer_stick_threshold': threshold,
+            'num_decks': num_decks,
+        }
+        self.shape = tuple(shape)
+        self._terminal = dict(zip(TERMINAL_STATES, terminal))
+        self.policy = np.frombuffer(self._mmap, dtype=np.int8, offset=HEADER.size).reshape(self.shape)
+        self._actions = memoryview(self._mmap)[HEADER.size:]
+
+    def decision(self, state):
+        player_sum, dealer_card, usable_ace = state
+        num_sums, num_dealer_cards, _ = self.shape
+        if player_sum < 2:
+            # WIN/DRAW/LOSE were exported; like autoplay_decision, any other
+            # state outside the table is a HIT
+            return self._terminal.get(state, HIT)
+        if not 0 <= dealer_card < num_dealer_cards or usable_ace not in (0, 1):
+            return HIT
+        player_sum = min(player_sum, num_sums - 1)
+        return self._actions[(player_sum * num_dealer_cards + dealer_card) * 2 + usable_ace]
+
+    def check_agent(self, agent):
+        """Raise ``ValueError`` unless ``decision`` matches ``agent.autoplay_decision`` on every state.
+
+        Covers the agent's states plus a margin of out-of-range sums and
+        dealer cards around the table.
+        """
+        num_sums, num_dealer_cards, _ = self.shape
+        states = set(agent.Q_values)
+        states.update((player_sum, dealer_card, usable_ace)
+                      for player_sum in range(-3, num_sums + 2)
+                      for dealer_card in range(-2, num_dealer_cards + 2)
+                      for usable_ace in (False, True))
+        mismatched = sorted(state for state in states
+                            if self.decision(state) != agent.autoplay_decision(state))
+        if mismatched:
+            raise ValueError(f"Policy disagrees with the agent in {len(mismatched)} states, "
+                             f"e.g. {mismatched[:5]}")
+
+    def check_rules(self, env):
+        """Raise ``ValueError`` if ``env`` plays by different rules than the policy."""
+        mismatched = [f"{name}: policy={expected!r}, env={getattr(env, name)!r}"
+                      for name, expected in self.rules.items()
+                      if getattr(env, name) != expected]
+        if mismatched:
+            raise ValueError("Policy was compiled for different rules (" + "; ".join(mismatched) + ")")
+
+    def close(self):
+        del self.policy
+        self._actions.release()
+        self._mmap.close()
+
+
+def load_policy(path, env=None):
+    """Memory-map a policy file, checking its rules against ``env`` if given."""
+    policy = CompiledPolicy(path)
+    if env is not None:
+        policy.check_rules(env)
+    return policy
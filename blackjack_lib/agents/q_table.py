@@ -0,0 +1,160 @@
+from collections.abc import MutableMapping, MutableSequence, Sequence
+import numpy as np
+
+NUM_DEALER_CARDS = 10
+NUM_TERMINAL_STATES = 3
+
+
+class QTable:
+    """Contiguous Q-value and visit-count arrays over the QAgent state space.
+
+    Row ``index(state)`` is a perfect index matching the order of
+    ``QAgent._generate_states``: WIN, DRAW, LOSE, then ``(player_sum,
+    dealer_card, usable_ace)`` for sums 2..max_hand_value, dealer cards 1..10.
+    ``Q`` and ``N`` may be passed in to wrap existing (e.g. shared-memory)
+    arrays. ``Q_view``/``N_view`` expose the table through the dict interface
+    of ``QAgent.Q_values``/``QAgent.N_Q``, with each row a list-like proxy
+    that reads and writes the array in place; ``flat_views`` is the fast
+    path for training loops.
+    """
+
+    def __init__(self, max_hand_value=21, dtype='float64', Q=None, N=None):
+        self.max_hand_value = max_hand_value
+        self.num_states = NUM_TERMINAL_STATES + (max_hand_value - 1) * NUM_DEALER_CARDS * 2
+        shape = (self.num_states, 2)
+        self.Q = np.zeros(shape, dtype=dtype) if Q is None else Q
+        self.N = np.zeros(shape, dtype=np.uint32) if N is None else N
+        self._make_views()
+
+    def _make_views(self):
+        self.Q_view = _RowView(self, 'Q_view', 'Q')
+        self.N_view = _RowView(self, 'N_view', 'N')
+
+    def index(self, state):
+        player_sum, dealer_card, usable_ace = state
+        if player_sum < 2:
+            # WIN_STATE, DRAW_STATE, LOSE_STATE have player_sum 1, 0, -1
+            return 1 - player_sum
+        return NUM_TERMINAL_STATES + ((player_sum - 2) * NUM_DEALER_CARDS + dealer_card - 1) * 2 + usable_ace
+
+    def contains(self, state):
+        player_sum, dealer_card, usable_ace = state
+        if player_sum < 2:
+            return player_sum >= -1 and dealer_card == 0 and usable_ace == 0
+        return player_sum <= self.max_hand_value and 1 <= dealer_card <= NUM_DEALER_CARDS
+
+    def states(self):
+        states = [(1, 0, 0), (0, 0, 0), (-1, 0, 0)]
+        for player_sum in range(2, self.max_hand_value + 1):
+            for dealer_card in range(1, NUM_DEALER_CARDS + 1):
+                for usable_ace in [False, True]:
+                    states.append((player_sum, dealer_card, usable_ace))
+        return states
+
+    def load(self, Q_values, N_Q):
+        """Copy dict-layout tables (as used by QAgent) into the arrays."""
+        for state, values in Q_values.items():
+            self.Q[self.index(state)] = values
+        for state, counts in N_Q.items():
+            self.N[self.index(state)] = counts
+
+    def flat_views(self):
+        """Flat memoryviews of ``Q`` and ``N``: state ``index(state)`` is at ``2 * i`` (STAND) and ``2 * i + 1`` (HIT).
+
+        Elements read as Python floats/ints and write straight into the
+        arrays, which makes them the fastest per-element access for training
+        loops. Release them when done if the arrays live in shared memory.
+        """
+        return memoryview(self.Q.reshape(-1)), memoryview(self.N.reshape(-1))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['Q_view'], state['N_view']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._make_views()
+
+
+class _RowView(MutableMapping):
+    # Dict interface over one table array for code outside the training
+    # loop: view[state] is a _Row over the array row, so view[state][a] += x
+    # updates the table as it would a dict backend's list, and
+    # view[state] = row overwrites it. Nothing is stored per state.
+    def __init__(self, table, name, attr):
+        self.table = table
+        self.name = name
+        self.attr = attr
+
+    def __getitem__(self, state):
+        if state not in self:
+            raise KeyError(state)
+        return _Row(getattr(self.table, self.attr)[self.table.index(state)])
+
+    def __setitem__(self, state, values):
+        if state not in self:
+            raise KeyError(state)
+        getattr(self.table, self.attr)[self.table.index(state)] = values
+
+    def __delitem__(self, state):
+        raise TypeError("QTable states cannot be removed")
+
+    def __contains__(self, state):
+        try:
+            return self.table.contains(state)
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self):
+        return iter(self.table.states())
+
+    def __len__(self):
+        return self.table.num_states
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        # Rebuilt from the (pickled) table
+        return getattr, (self.table, self.name)
+
+
+class _Row(MutableSequence):
+    # Fixed-length list stand-in for one table row: items read as Python
+    # numbers and writes go straight into the array
+    __slots__ = ('row',)
+
+    def __init__(self, row):
+        self.row = row
+
+    def __getitem__(self, i):
+        value = self.row[i]
+        return value.tolist() if isinstance(i, slice) else value.item()
+
+    def __setitem__(self, i, value):
+        self.row[i] = value
+
+    def __delitem__(self, i):
+        raise TypeError("QTable rows have a fixed length")
+
+    def insert(self, i, value):
+        raise TypeError("QTable rows have a fixed length")
+
+    def __len__(self):
+        return len(self.row)
+
+    def __iter__(self):
+        return iter(self.row.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.row.tolist())
+
+    def __reduce__(self):
+        # A pickled row is a detached copy
+        return list, (self.row.tolist(),)
@@ -0,0 +1,124 @@
+import math
+import time
+import multiprocessing
+import numpy as np
+from blackjack_lib.agents.Q_agent import QAgent
+from blackjack_lib.agents.evaluation import evaluate_policy
+from blackjack_lib.environment.card_stream import generate_card_stream
+
+
+def successive_halving(configs, min_budget=5000, max_budget=50000, eta=3, num_eval=10000,
+                       num_workers=None, seed=None, verbose=False, bracket=0, pool=None,
+                       common_random_numbers=False):
+    """Successive halving over QAgent hyperparameter ``configs``.
+
+    Each config is a dict with ``discount``, ``epsilon`` and ``lr_base``.
+    Every config is trained for ``min_budget`` episodes and scored by the
+    greedy win rate over ``num_eval`` games; the best ``1/eta`` move up to
+    ``eta`` times the budget, until ``max_budget`` is reached. Promoted agents
+    keep training from where they stopped rather than starting over. Trials
+    of a rung run on a process pool of ``num_workers`` (1 runs inline); every
+    trial's seed depends only on ``seed`` and the config's position, so the
+    result does not depend on the number of workers. With
+    ``common_random_numbers`` every config of a rung is evaluated on the same
+    pre-dealt card stream, so rankings reflect the policies rather than the
+    luck of the deal.
+
+    Returns one record per config, from the last rung it reached: the
+    hyperparameters, ``win_rate``, ``budget`` (training episodes),
+    ``rung``, ``bracket`` and the cumulative ``train_time``/``eval_time``.
+    """
+    num_rungs = int(math.floor(math.log(max_budget / min_budget, eta) + 1e-9)) + 1
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(configs))
+    # Per trial: one stream for the agent, then one evaluation stream per rung
+    trials = [{'config': dict(config), 'agent': None, 'seeds': trial_seed.spawn(num_rungs + 1),
+               'budget': 0, 'train_time': 0.0, 'eval_time': 0.0}
+              for config, trial_seed in zip(configs, seeds)]
+    stream_seeds = seed.spawn(num_rungs)
+
+    own_pool = pool is None and num_workers != 1
+    if own_pool:
+        pool = multiprocessing.Pool(num_workers)
+    try:
+        active = trials
+        for rung in range(num_rungs):
+            budget = max_budget if rung == num_rungs - 1 else int(min_budget * eta ** rung)
+            if verbose:
+                print(f"Bracket {bracket}, rung {rung}: {len(active)} configs x {budget:,} episodes")
+
+            card_stream = (generate_card_stream(num_eval, seed=stream_seeds[rung])
+                           if common_random_numbers else None)
+            jobs = [(t['agent'], t['config'], t['seeds'][0], t['seeds'][rung + 1],
+                     t['budget'], budget, num_eval, card_stream)
+                    for t in active]
+            outcomes = pool.map(_run_trial, jobs) if pool is not None else list(map(_run_trial, jobs))
+            for trial, (agent, win_rate, train_time, eval_time) in zip(active, outcomes):
+                trial.update(agent=agent, win_rate=win_rate, budget=budget, rung=rung,
+                             train_time=trial['train_time'] + train_time,
+                             eval_time=trial['eval_time'] + eval_time)
+
+            # Stable sort: ties keep grid order, so promotions are deterministic
+            ranked = sorted(active, key=lambda t: -t['win_rate'])
+            active = ranked[:max(1, len(active) // eta)]
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
+
+    return [{**t['config'], 'win_rate': t['win_rate'], 'budget': t['budget'], 'rung': t['rung'],
+             'bracket': bracket, 'train_time': t['train_time'], 'eval_time': t['eval_time']}
+            for t in trials]
+
+
+def hyperband(configs, min_budget=5000, max_budget=50000, eta=3, num_eval=10000,
+              num_workers=None, seed=None, verbose=False, common_random_numbers=False):
+    """Hyperband: successive halving brackets trading config count for starting budget.
+
+    With ``s_max = floor(log_eta(max_budget / min_budget))``, bracket ``s``
+    starts ``ceil((s_max + 1) / (s + 1) * eta**s)`` configs (capped at
+    ``len(configs)`` and drawn from ``configs`` with ``seed``) at
+    ``min_budget * eta**(s_max - s)`` episodes, from the most exploratory
+    bracket, which starts at ``min_budget``, down to one that trains a few
+    configs at the full budget. Returns the records of every bracket; see
+    ``successive_halving``.
+    """
+    s_max = int(math.floor(math.log(max_budget / min_budget, eta) + 1e-9))
+    bracket_seeds = np.random.SeedSequence(seed).spawn(s_max + 1)
+    pool = multiprocessing.Pool(num_workers) if num_workers != 1 else None
+    try:
+        records = []
+        for s in range(s_max, -1, -1):
+            n = min(len(configs), int(math.ceil((s_max + 1) / (s + 1) * eta ** s)))
+            pick_seed, trial_seed = bracket_seeds[s].spawn(2)
+            picks = np.sort(np.random.default_rng(pick_seed).permutation(len(configs))[:n])
+            # Never below min_budget; each bracket gets s + 1 rungs ending at max_budget
+            bracket_budget = min(max_budget, int(min_budget * eta ** (s_max - s)))
+            records += successive_halving([configs[i] for i in picks],
+                                          min_budget=bracket_budget,
+                                          max_budget=max_budget, eta=eta, num_eval=num_eval,
+                                          seed=trial_seed, verbose=verbose,
+                                          bracket=s_max - s, pool=pool,
+                                          common_random_numbers=common_random_numbers)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return records
+
+
+def _run_trial(job):
+    agent, config, agent_seed, eval_seed, trained, budget, num_eval, card_stream = job
+    if agent is None:
+        agent = QAgent(discount=config['discount'], lr_base=config['lr_base'], seed=agent_seed)
+
+    start = time.perf_counter()
+    agent.Q_run(num_simulation=budget - trained, epsilon=config['epsilon'])
+    train_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    win_rate = evaluate_policy(agent, num_games=num_eval, seed=eval_seed,
+                               card_stream=card_stream)['win_rate']
+    eval_time = time.perf_counter() - start
+    return agent, win_rate, train_time, eval_time
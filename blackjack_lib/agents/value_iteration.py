@@ -0,0 +1,82 @@
+import numpy as np
+from blackjack_lib.agents.Q_agent import STAND, HIT, WIN_STATE, DRAW_STATE, LOSE_STATE
+from blackjack_lib.environment.blackjack import RANK_VALUES
+from blackjack_lib.environment.dealer import dealer_outcomes, stand_ev_table
+
+
+def solve_optimal_Q(max_hand_value=21, force_ace_value=None, dealer_stick_threshold=17,
+                    discount=0.95, num_decks=None, tol=1e-12, max_iter=1000):
+    """Exact Q-values for the QAgent state space by value iteration.
+
+    Player draws come from an infinite deck (the only composition for which
+    ``(player_sum, dealer_card, usable_ace)`` is Markov); the dealer's final
+    total uses ``dealer_outcomes`` with the given ``num_decks``. The returned
+    Q-values are the fixed point of the ``Q_run`` update, so a transition
+    into a terminal state is discounted once, and they use the same dict
+    layout as ``QAgent.Q_values``. Also returns the greedy policy per state.
+
+    With ``force_ace_value`` set the usable-ace states are unreachable and
+    keep a zero hit value; ``force_ace_value=11`` also adds the states with
+    ``dealer_card == 11``, which the env reports for an ace up-card.
+    """
+    soft_aces = force_ace_value is None
+    values = np.array(RANK_VALUES)
+    if not soft_aces:
+        values[0] = force_ace_value
+    card_values, card_probs = np.unique(values, return_counts=True)
+    card_probs = card_probs / len(values)
+    ace_value = values[0]
+
+    # Player hand states (sum, usable_ace) in the order _generate_states uses
+    sums = np.arange(2, max_hand_value + 1)
+    hands = [(s, ace) for s in sums for ace in (False, True)]
+    hand_index = {hand: i for i, hand in enumerate(hands)}
+    # Up-card values the env can report; force_ace_value=11 adds 11
+    dealer_cards = np.union1d(np.arange(1, 11), card_values)
+
+    # Hit transition matrix between hand states plus per-state bust probability
+    transitions = np.zeros((len(hands), len(hands)))
+    bust = np.zeros(len(hands))
+    for i, (player_sum, usable) in enumerate(hands):
+        if usable and not soft_aces:
+            # Unreachable without soft aces; hard = sum - 10 may not even be a hand
+            continue
+        hard = player_sum - 10 if usable else player_sum
+        for value, p in zip(card_values, card_probs):
+            new_hard = hard + value
+            has_ace = usable or (soft_aces and value == ace_value)
+            if has_ace and soft_aces and new_hard + 10 <= max_hand_value:
+                new_hand = (new_hard + 10, True)
+            else:
+                new_hand = (new_hard, False)
+            if new_hand[0] > max_hand_value:
+                bust[i] += p
+            else:
+                transitions[i, hand_index[new_hand]] += p
+
+    ev = stand_ev_table(dealer_outcomes(max_hand_value, force_ace_value,
+                                        dealer_stick_threshold, num_decks))
+    hand_sums = np.array([player_sum for player_sum, _ in hands])
+    stand_Q = discount * ev[dealer_cards][:, hand_sums].T
+
+    V = stand_Q.copy()
+    for _ in range(max_iter):
+        hit_Q = discount * (transitions @ V - bust[:, None])
+        new_V = np.maximum(stand_Q, hit_Q)
+        delta = np.abs(new_V - V).max()
+        V = new_V
+        if delta < tol:
+            break
+    hit_Q = discount * (transitions @ V - bust[:, None])
+
+    Q_values = {WIN_STATE: [1.0, 1.0], DRAW_STATE: [0.0, 0.0], LOSE_STATE: [-1.0, -1.0]}
+    policy = {}
+    for player_sum in sums:
+        for d, dealer_card in enumerate(dealer_cards):
+            for usable in (False, True):
+                i = hand_index[(player_sum, usable)]
+                state = (int(player_sum), int(dealer_card), usable)
+                Q_values[state] = [float(stand_Q[i, d]), float(hit_Q[i, d])]
+                # Ties go to HIT, matching QAgent.autoplay_decision
+                policy[state] = STAND if stand_Q[i, d] > hit_Q[i, d] else HIT
+    return Q_values, policy
@@ -1,4 +1,5 @@
 from .deck import Deck
 from .blackjack import BlackjackEnv, InteractiveBlackjack
+from .batch import BatchBlackjackEnv
 
-__all__ = ['Deck', 'BlackjackEnv', 'InteractiveBlackjack']
\ No newline at end of file
+__all__ = ['Deck', 'BlackjackEnv', 'InteractiveBlackjack', 'BatchBlackjackEnv']
\ No newline at end of file
@@ -0,0 +1,220 @@
+from typing import Dict, Tuple
+import numpy as np
+from .blackjack import DEFAULT_MAX_HAND_VALUE, RANK_VALUES
+from .rng import make_generator
+
+NUM_RANKS = len(RANK_VALUES)
+
+# Result codes reported in info['result']; -1 marks a game that is still running
+RESULTS = ('player_bust', 'dealer_bust', 'player_win', 'dealer_win', 'draw')
+NOT_DONE = -1
+PLAYER_BUST, DEALER_BUST, PLAYER_WIN, DEALER_WIN, DRAW = range(len(RESULTS))
+
+
+def rank_value_table(force_ace_value: int = None) -> np.ndarray:
+    """Card value for each rank code (0 = A, 1 = 2, ..., 9 = 10, 10-12 = J/Q/K)."""
+    values = np.array(RANK_VALUES, dtype=np.int64)
+    if force_ace_value is not None:
+        values[0] = force_ace_value
+    return values
+
+
+class BatchBlackjackEnv:
+    """Vectorized blackjack environment playing ``num_envs`` games in lockstep.
+
+    Follows the same rules as ``BlackjackEnv``: every game is dealt from its own
+    freshly shuffled ``num_decks`` shoe, which is tracked as per-rank counts so a
+    draw costs O(1) per game instead of a full shuffle.
+
+    With ``record_cards`` every draw is logged as a column of rank codes in
+    ``player_cards``/``dealer_cards`` (-1 for games that did not draw), which
+    ``flatten_columns`` turns into flat card arrays with per-game offsets.
+
+    ``use_card_stream`` switches the games to replaying pre-dealt rank codes
+    (see ``generate_card_stream``) instead of drawing from ``rng``.
+    """
+
+    def __init__(self, num_envs: int,
+                 num_decks: int = 1,
+                 natural_payout: float = 1.0,
+                 max_hand_value: int = DEFAULT_MAX_HAND_VALUE,
+                 force_ace_value: int = None,
+                 dealer_stick_threshold: int = 17,
+                 seed=None,
+                 record_cards: bool = False):
+
+        self.num_envs = num_envs
+        self.num_decks = num_decks
+        self.natural_payout = natural_payout
+        self.max_hand_value = max_hand_value
+        self.force_ace_value = force_ace_value
+        self.dealer_stick_threshold = dealer_stick_threshold
+        self.rng = make_generator(seed)
+        self.record_cards = record_cards
+
+        self.rank_values = rank_value_table(force_ace_value)
+        self.shoe = np.full(NUM_RANKS, 4 * num_decks, dtype=np.int32)
+        self.counts = np.empty((num_envs, NUM_RANKS), dtype=np.int32)
+        self.remaining = np.empty(num_envs, dtype=np.int32)
+
+        self.player_hard = np.zeros(num_envs, dtype=np.int64)
+        self.player_aces = np.zeros(num_envs, dtype=np.int64)
+        self.dealer_hard = np.zeros(num_envs, dtype=np.int64)
+        self.dealer_aces = np.zeros(num_envs, dtype=np.int64)
+        self.dealer_up = np.zeros(num_envs, dtype=np.int64)
+        self.dealer_hole = np.zeros(num_envs, dtype=np.int64)
+
+        self.player_sum = np.zeros(num_envs, dtype=np.int64)
+        self.usable_ace = np.zeros(num_envs, dtype=bool)
+        self.dealer_sum = np.zeros(num_envs, dtype=np.int64)
+        self.done = np.ones(num_envs, dtype=bool)
+        self.result = np.full(num_envs, NOT_DONE, dtype=np.int8)
+        self.player_cards = []
+        self.dealer_cards = []
+        self.card_stream = None
+        self.stream_pos = np.zeros(num_envs, dtype=np.int64)
+
+    def use_card_stream(self, stream):
+        """Deal game i's cards from row i of ``stream`` on every reset (``None`` to stop)."""
+        if stream is not None and len(stream) != self.num_envs:
+            raise ValueError(f"Card stream has {len(stream)} rows, expected {self.num_envs}")
+        self.card_stream = stream
+
+    def reset(self) -> np.ndarray:
+        self.counts[:] = self.shoe
+        self.remaining[:] = self.shoe.sum()
+        self.done[:] = False
+        self.result[:] = NOT_DONE
+        self.stream_pos[:] = 0
+
+        rows = np.arange(self.num_envs)
+        first, second = self._draw(rows), self._draw(rows)
+        self.dealer_up = self._draw(rows)
+        self.dealer_hole = self._draw(rows)
+        if self.record_cards:
+            self.player_cards = [first.astype(np.int8), second.astype(np.int8)]
+            self.dealer_cards = [self.dealer_up.astype(np.int8), self.dealer_hole.astype(np.int8)]
+
+        self.player_hard = self.rank_values[first] + self.rank_values[second]
+        self.player_aces = (first == 0).astype(np.int64) + (second == 0)
+        self.dealer_hard = self.rank_values[self.dealer_up] + self.rank_values[self.dealer_hole]
+        self.dealer_aces = (self.dealer_up == 0).astype(np.int64) + (self.dealer_hole == 0)
+
+        self.player_sum, self.usable_ace = self._hand_value(self.player_hard, self.player_aces)
+        self.dealer_sum, _ = self._hand_value(self.dealer_hard, self.dealer_aces)
+        return self.get_state()
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """Apply one action per game (1 = hit, anything else = stand).
+
+        Games that are already finished ignore their action and receive a
+        reward of 0. ``info['result']`` holds a code into ``RESULTS`` for every
+        finished game and ``NOT_DONE`` otherwise.
+        """
+        if self.done.all():
+            raise Exception("All games are over. Call reset() to start new games.")
+
+        actions = np.asarray(actions)
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        active = ~self.done
+        hitting = np.flatnonzero(active & (actions == 1))
+        standing = np.flatnonzero(active & (actions != 1))
+
+        if hitting.size:
+            ranks = self._draw(hitting)
+            if self.record_cards:
+                self.player_cards.append(self._card_column(hitting, ranks))
+            self.player_hard[hitting] += self.rank_values[ranks]
+            self.player_aces[hitting] += ranks == 0
+            self.player_sum[hitting], self.usable_ace[hitting] = self._hand_value(
+                self.player_hard[hitting], self.player_aces[hitting])
+
+            bust = hitting[self.player_sum[hitting] > self.max_hand_value]
+            self.done[bust] = True
+            self.result[bust] = PLAYER_BUST
+            rewards[bust] = -1.0
+
+        if standing.size:
+            rewards[standing] = self._dealer_play(standing)
+            self.done[standing] = True
+
+        return self.get_state(), rewards, self.done.copy(), {'result': self.result.copy()}
+
+    def _dealer_play(self, rows: np.ndarray) -> np.ndarray:
+        # Dealer keeps hitting in every game that is still below the threshold
+        drawing = rows[self.dealer_sum[rows] < self.dealer_stick_threshold]
+        while drawing.size:
+            ranks = self._draw(drawing)
+            if self.record_cards:
+                self.dealer_cards.append(self._card_column(drawing, ranks))
+            self.dealer_hard[drawing] += self.rank_values[ranks]
+            self.dealer_aces[drawing] += ranks == 0
+            self.dealer_sum[drawing], _ = self._hand_value(
+                self.dealer_hard[drawing], self.dealer_aces[drawing])
+            drawing = drawing[self.dealer_sum[drawing] < self.dealer_stick_threshold]
+
+        player, dealer = self.player_sum[rows], self.dealer_sum[rows]
+        dealer_bust = dealer > self.max_hand_value
+        result = np.select([dealer_bust, player > dealer, player < dealer],
+                           [DEALER_BUST, PLAYER_WIN, DEALER_WIN], DRAW)
+        self.result[rows] = result
+        return np.select([result == DEALER_WIN, result == DRAW], [-1.0, 0.0], 1.0)
+
+    def _hand_value(self, hard: np.ndarray, aces: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.force_ace_value is not None:
+            return hard.copy(), np.zeros(hard.shape, dtype=bool)
+        usable = (aces > 0) & (hard + 10 <= self.max_hand_value)
+        return hard + 10 * usable, usable
+
+    def _draw(self, rows: np.ndarray) -> np.ndarray:
+        if self.card_stream is not None:
+            ranks = self.card_stream[rows, self.stream_pos[rows]].astype(np.int64)
+            self.stream_pos[rows] += 1
+            self.counts[rows, ranks] -= 1
+            self.remaining[rows] -= 1
+            return ranks
+
+        # Sample one card without replacement from each game's remaining shoe by
+        # rejection: propose a rank uniformly and accept it with probability
+        # count / full_count, which touches one count per game instead of 13
+        empty = rows[self.remaining[rows] == 0]
+        if empty.size:
+            self.counts[empty] = self.shoe
+            self.remaining[empty] = self.shoe.sum()
+
+        full_count = int(self.shoe[0])
+        ranks = np.empty(rows.size, dtype=np.int64)
+        pending = np.arange(rows.size)
+        while pending.size:
+            proposal = self.rng.integers(0, NUM_RANKS * full_count, pending.size)
+            rank = proposal // full_count
+            accept = proposal - rank * full_count < self.counts[rows[pending], rank]
+            ranks[pending[accept]] = rank[accept]
+            pending = pending[~accept]
+
+        self.counts[rows, ranks] -= 1
+        self.remaining[rows] -= 1
+        return ranks
+
+    def _card_column(self, rows: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+        column = np.full(self.num_envs, -1, dtype=np.int8)
+        column[rows] = ranks
+        return column
+
+    def get_state(self) -> np.ndarray:
+        """(num_envs, 3) array of (player_sum, dealer_card, usable_ace)."""
+        return np.stack([self.player_sum,
+                         self.rank_values[self.dealer_up],
+                         self.usable_ace.astype(np.int64)], axis=1)
+
+    def __repr__(self) -> str:
+        return f"BatchBlackjackEnv(num_envs={self.num_envs}, num_decks={self.num_decks})"
+
+
+def flatten_columns(columns) -> Tuple[np.ndarray, np.ndarray]:
+    """Flatten per-step columns (-1 = no entry) into values and (N + 1) offsets."""
+    matrix = np.stack(columns, axis=1)
+    mask = matrix >= 0
+    offsets = np.zeros(matrix.shape[0] + 1, dtype=np.int64)
+    np.cumsum(mask.sum(axis=1), out=offsets[1:])
+    return matrix[mask], offsets
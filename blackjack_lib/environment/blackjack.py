@@ -1,73 +1,150 @@
 from typing import Tuple, List, Dict
-from .deck import Deck
+from .deck import Deck, HI_LO
 
 # Default constant
 DEFAULT_MAX_HAND_VALUE = 21
 
+# Card value for each rank code (A, 2-10, J, Q, K)
+RANK_VALUES = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10)
+
 
 class BlackjackEnv:
-    """Blackjack environment for reinforcement learning."""
+    """Blackjack environment for reinforcement learning.
+
+    By default the deck is reshuffled before every hand. Passing
+    ``penetration`` or ``cut_card`` switches to a persistent shoe that is only
+    reshuffled once the cut card is reached; ``info`` then also reports the
+    cards remaining and the counts of the cards seen so far (see
+    ``shoe_info``, which also has them before the first decision of a hand).
+
+    ``seed`` may be an int, ``SeedSequence``, ``random.Random`` or
+    ``numpy.random.Generator`` (see ``make_rng``) and drives the deck.
+    """
 
     def __init__(self, num_decks: int = 1,
                  natural_payout: float = 1.0,
                  max_hand_value: int = DEFAULT_MAX_HAND_VALUE,
                  force_ace_value: int = None,
-                 dealer_stick_threshold: int = 17):
+                 dealer_stick_threshold: int = 17,
+                 penetration: float = None,
+                 cut_card: int = None,
+                 seed=None):
 
         self.num_decks = num_decks
         self.natural_payout = natural_payout
         self.max_hand_value = max_hand_value
         self.force_ace_value = force_ace_value
         self.dealer_stick_threshold = dealer_stick_threshold
-        self.deck = Deck(num_decks=num_decks)
-
-        self.player_hand: List[str] = []
-        self.dealer_hand: List[str] = []
+        self.deck = Deck(num_decks=num_decks, penetration=penetration, cut_card=cut_card,
+                         rng=seed)
+        self.shoe_mode = penetration is not None or cut_card is not None
+
+        # Value of every card code, with the ace value forced if requested
+        self.card_values = [RANK_VALUES[code >> 2] for code in range(len(Deck.NAMES))]
+        if force_ace_value is not None:
+            self.card_values[:4] = [force_ace_value] * 4
+
+        self.player_hand: List[int] = []
+        self.dealer_hand: List[int] = []
+        # Running hard totals and ace counts, updated in O(1) per card
+        self.player_hard = 0
+        self.player_aces = 0
+        self.dealer_hard = 0
+        self.dealer_aces = 0
         self.player_sum = 0
         self.dealer_sum = 0
         self.usable_ace = False
         self.game_over = False
+        self.hole_card_shoe = None
 
     def reset(self) -> Tuple[int, int, bool]:
-        self.deck.shuffle()
+        if not self.shoe_mode or self.deck.needs_shuffle():
+            self.deck.shuffle()
         self.game_over = False
 
         self.player_hand = [self.deck.deal(), self.deck.deal()]
         self.dealer_hand = [self.deck.deal(), self.deck.deal()]
+        # Shoe the hole card came from; the deck may reshuffle mid-hand
+        self.hole_card_shoe = self.deck.shuffles
 
-        self.player_sum, self.usable_ace = self._calculate_hand(self.player_hand)
-        self.dealer_sum, _ = self._calculate_hand(self.dealer_hand)
+        card_values = self.card_values
+        self.player_hard = card_values[self.player_hand[0]] + card_values[self.player_hand[1]]
+        self.player_aces = (self.player_hand[0] < 4) + (self.player_hand[1] < 4)
+        self.dealer_hard = card_values[self.dealer_hand[0]] + card_values[self.dealer_hand[1]]
+        self.dealer_aces = (self.dealer_hand[0] < 4) + (self.dealer_hand[1] < 4)
 
-        dealer_card = self._card_value(self.dealer_hand[0])
+        self.player_sum, self.usable_ace = self._hand_value(self.player_hard, self.player_aces)
+        self.dealer_sum, _ = self._hand_value(self.dealer_hard, self.dealer_aces)
+
+        dealer_card = card_values[self.dealer_hand[0]]
         return (self.player_sum, dealer_card, self.usable_ace)
 
     def step(self, action: int) -> Tuple[Tuple[int, int, bool], float, bool, Dict]:
         if self.game_over:
             raise Exception("Game is over. Call reset() to start a new game.")
 
-        dealer_card = self._card_value(self.dealer_hand[0])
+        dealer_card = self.card_values[self.dealer_hand[0]]
 
         if action == 1:  # Hit
-            self.player_hand.append(self.deck.deal())
-            self.player_sum, self.usable_ace = self._calculate_hand(self.player_hand)
+            card = self.deck.deal()
+            self.player_hand.append(card)
+            self.player_hard += self.card_values[card]
+            self.player_aces += card < 4
+            self.player_sum, self.usable_ace = self._hand_value(self.player_hard, self.player_aces)
 
             if self.player_sum > self.max_hand_value:
                 self.game_over = True
-                return (self.player_sum, dealer_card, self.usable_ace), -1.0, True, {'result': 'player_bust'}
+                return (self.player_sum, dealer_card, self.usable_ace), -1.0, True, self._info('player_bust')
 
-            return (self.player_sum, dealer_card, self.usable_ace), 0.0, False, {}
+            return (self.player_sum, dealer_card, self.usable_ace), 0.0, False, self._info()
         else:  # Stand
             reward, result = self._dealer_play()
             self.game_over = True
-            return (self.player_sum, dealer_card, self.usable_ace), reward, True, {'result': result}
+            return (self.player_sum, dealer_card, self.usable_ace), reward, True, self._info(result)
+
+    @property
+    def shoe_info(self) -> Dict:
+        """What a counter knows about the shoe now (empty unless in shoe mode).
+
+        ``cards_remaining`` in the shoe, ``rank_counts`` and the Hi-Lo
+        ``running_count`` of the cards seen since the last shuffle, the
+        ``true_count`` (running count per deck of unseen cards) and the
+        ``penetration`` (fraction of the shoe dealt). ``step`` merges this
+        into ``info``; read it after ``reset`` for the first decision.
+        """
+        if not self.shoe_mode:
+            return {}
+        deck = self.deck
+        rank_counts = list(deck.rank_counts)
+        # The dealer's hole card has been dealt but not yet seen. After a
+        # mid-hand reshuffle it is not in the new shoe's counts
+        hidden = not self.game_over and self.hole_card_shoe == deck.shuffles
+        if hidden:
+            rank_counts[self.dealer_hand[1] >> 2] -= 1
+        running_count = sum(tag * count for tag, count in zip(HI_LO, rank_counts))
+        unseen = deck.cards_remaining() + hidden
+        return {
+            'cards_remaining': deck.cards_remaining(),
+            'rank_counts': tuple(rank_counts),
+            'running_count': running_count,
+            'true_count': running_count * len(Deck.NAMES) / unseen if unseen else 0.0,
+            'penetration': deck.position / len(deck.codes),
+        }
+
+    def _info(self, result: str = None) -> Dict:
+        info = {} if result is None else {'result': result}
+        if self.shoe_mode:
+            info.update(self.shoe_info)
+        return info
 
     def _dealer_play(self) -> Tuple[float, str]:
-        self.dealer_sum, _ = self._calculate_hand(self.dealer_hand)
-
         # Dealer continues hitting until they reach the threshold
         while self.dealer_sum < self.dealer_stick_threshold:
-            self.dealer_hand.append(self.deck.deal())
-            self.dealer_sum, _ = self._calculate_hand(self.dealer_hand)
+            card = self.deck.deal()
+            self.dealer_hand.append(card)
+            self.dealer_hard += self.card_values[card]
+            self.dealer_aces += card < 4
+            self.dealer_sum, _ = self._hand_value(self.dealer_hard, self.dealer_aces)
 
         if self.dealer_sum > self.max_hand_value:
             return 1.0, 'dealer_bust'
@@ -78,40 +155,31 @@ class BlackjackEnv:
         else:
             return 0.0, 'draw'
 
-    def _calculate_hand(self, hand: List[str]) -> Tuple[int, bool]:
-        hand_sum = sum(self._card_value(card) for card in hand)
-        usable_ace = False
-
-        if self.force_ace_value is None:
-            num_aces = sum(1 for card in hand if card[0] == 'A')
-            if num_aces > 0 and hand_sum + 10 <= self.max_hand_value:
-                hand_sum += 10
-                usable_ace = True
-
-        return hand_sum, usable_ace
-
-    def _card_value(self, card: str) -> int:
-        rank = card[0]
-        if rank == 'A':
-            if self.force_ace_value is not None:
-                return self.force_ace_value
-            return 1
-        elif rank in ['J', 'Q', 'K', '1']:
-            return 10
-        else:
-            return int(rank)
+    def _hand_value(self, hard: int, aces: int) -> Tuple[int, bool]:
+        # One ace counts high whenever that does not bust the hand
+        if aces and self.force_ace_value is None and hard + 10 <= self.max_hand_value:
+            return hard + 10, True
+        return hard, False
+
+    def _calculate_hand(self, hand: List[int]) -> Tuple[int, bool]:
+        hand_sum = sum(self.card_values[card] for card in hand)
+        num_aces = sum(1 for card in hand if card < 4)
+        return self._hand_value(hand_sum, num_aces)
+
+    def _card_value(self, card: int) -> int:
+        return self.card_values[card]
 
     def render(self, show_dealer_card: bool = True):
         print("\n" + "=" * 50)
-        print(f"Player hand: {' '.join(self.player_hand)}")
+        print(f"Player hand: {' '.join(Deck.card_strs(self.player_hand))}")
         print(f"Player sum: {self.player_sum} (usable ace: {self.usable_ace})")
         print("-" * 50)
 
         if show_dealer_card or self.game_over:
-            print(f"Dealer hand: {' '.join(self.dealer_hand)}")
+            print(f"Dealer hand: {' '.join(Deck.card_strs(self.dealer_hand))}")
             print(f"Dealer sum: {self.dealer_sum}")
         else:
-            print(f"Dealer hand: {self.dealer_hand[0]} [Hidden]")
+            print(f"Dealer hand: {Deck.card_str(self.dealer_hand[0])} [Hidden]")
             print(f"Dealer showing: {self._card_value(self.dealer_hand[0])}")
 
         print("=" * 50 + "\n")
@@ -0,0 +1,42 @@
+import numpy as np
+from .blackjack import DEFAULT_MAX_HAND_VALUE
+from .batch import NUM_RANKS, rank_value_table
+
+
+def cards_needed(num_decks: int = 1, max_hand_value: int = DEFAULT_MAX_HAND_VALUE,
+                 force_ace_value: int = None, dealer_stick_threshold: int = 17) -> int:
+    """Upper bound on the cards one game can use under the given rules.
+
+    Before its last card the player's hand totals at most ``max_hand_value``
+    and the dealer's less than ``dealer_stick_threshold`` (hard totals, aces
+    counted low), so all but two of a game's cards fit under the sum of
+    both; the bound takes the smallest cards in the shoe.
+    """
+    values = np.sort(np.repeat(rank_value_table(force_ace_value), 4 * num_decks))
+    limit = max_hand_value + max(max_hand_value, dealer_stick_threshold - 1)
+    smallest_sums = np.cumsum(values)
+    return min(int(np.searchsorted(smallest_sums, limit, side='right')) + 2, values.size)
+
+
+def generate_card_stream(num_games: int, num_decks: int = 1, width: int = None,
+                         seed=None, chunk_size: int = None, **rules) -> np.ndarray:
+    """Pre-deal ``num_games`` shoes as an int8 ``(num_games, width)`` array of rank codes.
+
+    Row i is the top of a freshly shuffled ``num_decks`` shoe for game i, so
+    ``BatchBlackjackEnv.use_card_stream`` can replay the same cards to every
+    policy being compared (common random numbers). ``width`` defaults to
+    ``cards_needed`` for ``rules`` (max_hand_value, force_ace_value,
+    dealer_stick_threshold).
+    """
+    rng = np.random.default_rng(seed)
+    if width is None:
+        width = cards_needed(num_decks, **rules)
+    shoe = np.repeat(np.arange(NUM_RANKS, dtype=np.int8), 4 * num_decks)
+    chunk_size = chunk_size or max(1, (1 << 22) // shoe.size)
+
+    stream = np.empty((num_games, width), dtype=np.int8)
+    for start in range(0, num_games, chunk_size):
+        size = min(chunk_size, num_games - start)
+        order = rng.random((size, shoe.size)).argsort(axis=1)[:, :width]
+        stream[start:start + size] = shoe[order]
+    return stream
@@ -0,0 +1,392 @@
+import os
+import json
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator
+import numpy as np
+from .deck import Deck
+from .batch import RESULTS
+from .episodes import (EPISODE_COLUMNS, generate_random_episodes, concatenate_episodes,
+                       outcome_names, shard_sizes)
+from .rng import run_sharded
+
+# On disk a dataset is a directory holding one raw little-endian file per
+# EPISODE_COLUMNS entry plus header.json, which is written last: a directory
+# without a header is an unfinished write. Cards are rank codes (0 = A ... 12 = K).
+FORMAT = 'blackjack-episodes'
+VERSION = 1
+HEADER_FILE = 'header.json'
+# A sharded dataset is a directory of dataset directories plus manifest.json
+MANIFEST_FORMAT = 'blackjack-episodes-manifest'
+MANIFEST_FILE = 'manifest.json'
+COLUMN_DTYPES = {name: np.dtype('<i8') if name.endswith('_offsets') else np.dtype('i1')
+                 for name in EPISODE_COLUMNS}
+# Flat value column -> the offsets column that splits it into episodes
+SEGMENTS = {'player_cards': 'player_offsets', 'dealer_cards': 'dealer_offsets',
+            'actions': 'turn_offsets'}
+ACTIONS = ('stand', 'hit')
+
+
+class EpisodeWriter:
+    """Stream episodes into a columnar dataset directory.
+
+    Chunks in the ``EPISODE_COLUMNS`` layout (as returned by
+    ``generate_random_episodes``) go through ``write``; single games through
+    ``write_episode``, which buffers ``buffer_size`` games per chunk. Only
+    the current chunk is held in memory. ``metadata`` is stored in the header.
+    """
+
+    def __init__(self, path, metadata: Dict = None, buffer_size: int = 100000):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        header = self.path / HEADER_FILE
+        if header.exists():
+            header.unlink()
+        self.metadata = metadata or {}
+        self.buffer_size = buffer_size
+        self.num_episodes = 0
+        self._files = {name: open(self.path / f'{name}.bin', 'wb') for name in EPISODE_COLUMNS}
+        self._lengths = dict.fromkeys(EPISODE_COLUMNS, 0)
+        self._bases = dict.fromkeys(SEGMENTS.values(), 0)
+        for name in self._bases:
+            self._append(name, np.zeros(1, dtype=np.int64))
+        self._pending = []
+
+    def write(self, episodes: Dict[str, np.ndarray]):
+        self._flush()
+        self._write(episodes)
+
+    def write_episode(self, player_cards, dealer_cards, actions, outcome):
+        """Add one game: card rank codes, 1 = hit / 0 = stand actions and a ``RESULTS`` entry."""
+        if isinstance(outcome, str):
+            outcome = RESULTS.index(outcome)
+        self._pending.append((player_cards, dealer_cards, actions, outcome))
+        if len(self._pending) >= self.buffer_size:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        for f in self._files.values():
+            f.close()
+        header = {
+            'format': FORMAT,
+            'version': VERSION,
+            'num_episodes': self.num_episodes,
+            'columns': {name: {'dtype': COLUMN_DTYPES[name].str, 'length': self._lengths[name]}
+                        for name in EPISODE_COLUMNS},
+            'metadata': self.metadata,
+        }
+        tmp_path = self.path / f'{HEADER_FILE}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f, indent=2)
+        os.replace(tmp_path, self.path / HEADER_FILE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self._files.values():
+                f.close()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        chunk = {'outcomes': np.array([p[3] for p in self._pending], dtype=np.int8)}
+        for i, name in enumerate(SEGMENTS):
+            parts = [p[i] for p in self._pending]
+            offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+            np.cumsum([len(part) for part in parts], out=offsets[1:])
+            chunk[name] = np.fromiter((v for part in parts for v in part), dtype=np.int8,
+                                      count=int(offsets[-1]))
+            chunk[SEGMENTS[name]] = offsets
+        self._pending = []
+        self._write(chunk)
+
+    def _write(self, episodes):
+        for name in SEGMENTS:
+            offsets_name = SEGMENTS[name]
+            offsets = np.asarray(episodes[offsets_name], dtype=np.int64)
+            self._append(name, np.asarray(episodes[name]))
+            self._append(offsets_name, offsets[1:] - offsets[0] + self._bases[offsets_name])
+            self._bases[offsets_name] += int(offsets[-1] - offsets[0])
+        self._append('outcomes', np.asarray(episodes['outcomes']))
+        self.num_episodes += len(episodes['outcomes'])
+
+    def _append(self, name, values):
+        values = np.asarray(values, dtype=COLUMN_DTYPES[name])
+        self._files[name].write(values.tobytes())
+        self._lengths[name] += len(values)
+
+
+class _EpisodeSource:
+    # Shared by single datasets and sharded ones; subclasses provide
+    # __len__, __getitem__, take and an ``outcomes`` array
+
+    def iter_batches(self, batch_size: int = 100000, shuffle: bool = False,
+                     seed=None) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield ``take`` batches covering every episode once, optionally in shuffled order."""
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        for start in range(0, len(self), batch_size):
+            yield self.take(order[start:start + batch_size])
+
+    def records(self, indices=None) -> Iterator[Dict]:
+        """Episodes in the ``blackjack_data.json`` record layout (see ``episode_records``)."""
+        indices = range(len(self)) if indices is None else indices
+        for i in indices:
+            yield _record(int(i), self[i])
+
+    def outcome_names(self) -> np.ndarray:
+        return outcome_names(self.outcomes)
+
+
+class EpisodeDataset(_EpisodeSource):
+    """Read-only, memory-mapped view of a dataset written by ``EpisodeWriter``.
+
+    ``columns`` maps every ``EPISODE_COLUMNS`` name to a memory-mapped array;
+    nothing is read until it is indexed. ``dataset[i]`` returns one game,
+    ``take(indices)`` a batch of games in the ``EPISODE_COLUMNS`` layout and
+    ``iter_batches`` walks the games in order or shuffled.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        header_path = self.path / HEADER_FILE
+        if not header_path.exists():
+            raise ValueError(f"{path} is not a finished episode dataset (no {HEADER_FILE})")
+        with open(header_path) as f:
+            self.header = json.load(f)
+        if self.header.get('format') != FORMAT:
+            raise ValueError(f"{path} is not an episode dataset")
+        if self.header['version'] != VERSION:
+            raise ValueError(f"{path} has dataset version {self.header['version']}, expected {VERSION}")
+
+        self.metadata = self.header['metadata']
+        self.columns = {}
+        for name, spec in self.header['columns'].items():
+            dtype, length = np.dtype(spec['dtype']), spec['length']
+            if length == 0:
+                self.columns[name] = np.zeros(0, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(self.path / f'{name}.bin', dtype=dtype,
+                                               mode='r', shape=(length,))
+
+    def __len__(self):
+        return self.header['num_episodes']
+
+    def __getitem__(self, i) -> Dict:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"episode {i} out of range for {len(self)} episodes")
+        i %= len(self)
+        episode = {}
+        for name, offsets_name in SEGMENTS.items():
+            offsets = self.columns[offsets_name]
+            episode[name] = np.asarray(self.columns[name][offsets[i]:offsets[i + 1]])
+        episode['outcome'] = int(self.columns['outcomes'][i])
+        return episode
+
+    def take(self, indices) -> Dict[str, np.ndarray]:
+        """Gather the episodes at ``indices`` into an in-memory ``EPISODE_COLUMNS`` dict."""
+        return take_episodes(self.columns, indices)
+
+    @property
+    def outcomes(self) -> np.ndarray:
+        return self.columns['outcomes']
+
+
+class ShardedDataset(_EpisodeSource):
+    """Several datasets stitched together by a ``manifest.json`` (see ``generate_dataset``).
+
+    Offers the ``EpisodeDataset`` interface over the concatenation of the
+    shards, in manifest order; each shard stays memory-mapped.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / MANIFEST_FILE) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != MANIFEST_FORMAT:
+            raise ValueError(f"{path} is not an episode dataset manifest")
+        self.metadata = self.manifest['metadata']
+        self.shards = [EpisodeDataset(self.path / shard['path']) for shard in self.manifest['shards']]
+        for shard, entry in zip(self.shards, self.manifest['shards']):
+            if len(shard) != entry['num_episodes']:
+                raise ValueError(f"Shard {entry['path']} has {len(shard)} episodes, "
+                                 f"manifest says {entry['num_episodes']}")
+        self.starts = np.zeros(len(self.shards) + 1, dtype=np.int64)
+        np.cumsum([len(shard) for shard in self.shards], out=self.starts[1:])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, i) -> Dict:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"episode {i} out of range for {len(self)} episodes")
+        i %= len(self)
+        shard = int(np.searchsorted(self.starts, i, side='right')) - 1
+        return self.shards[shard][i - int(self.starts[shard])]
+
+    def take(self, indices) -> Dict[str, np.ndarray]:
+        indices = np.asarray(indices, dtype=np.int64)
+        shard_of = np.searchsorted(self.starts, indices, side='right') - 1
+        # Gather shard by shard, then restore the requested order
+        order = np.argsort(shard_of, kind='stable')
+        chunks = []
+        for shard in np.unique(shard_of):
+            rows = indices[order][shard_of[order] == shard] - self.starts[shard]
+            chunks.append(self.shards[shard].take(rows))
+        grouped = concatenate_episodes(chunks)
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        return take_episodes(grouped, inverse)
+
+    @property
+    def outcomes(self) -> np.ndarray:
+        return np.concatenate([shard.outcomes for shard in self.shards]) if self.shards \
+            else np.zeros(0, dtype=np.int8)
+
+
+def open_dataset(path):
+    """``ShardedDataset`` if ``path`` holds a manifest, else ``EpisodeDataset``."""
+    if (Path(path) / MANIFEST_FILE).exists():
+        return ShardedDataset(path)
+    return EpisodeDataset(path)
+
+
+def take_episodes(columns: Dict[str, np.ndarray], indices) -> Dict[str, np.ndarray]:
+    """Gather episodes ``indices`` of an ``EPISODE_COLUMNS`` dict (arrays or memmaps)."""
+    indices = np.asarray(indices, dtype=np.int64)
+    batch = {'outcomes': np.asarray(columns['outcomes'][indices])}
+    for name, offsets_name in SEGMENTS.items():
+        offsets = columns[offsets_name]
+        starts, ends = offsets[indices], offsets[indices + 1]
+        lengths = ends - starts
+        new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=new_offsets[1:])
+        positions = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+        batch[name] = np.asarray(columns[name][positions])
+        batch[offsets_name] = new_offsets
+    return batch
+
+
+def episode_records(columns: Dict[str, np.ndarray]) -> Iterator[Dict]:
+    """Episodes of an ``EPISODE_COLUMNS`` dict in the ``blackjack_data.json`` record layout.
+
+    Only ranks are stored, so every card comes back as a spade.
+    """
+    for i in range(len(columns['outcomes'])):
+        episode = {name: columns[name][columns[offsets_name][i]:columns[offsets_name][i + 1]]
+                   for name, offsets_name in SEGMENTS.items()}
+        episode['outcome'] = int(columns['outcomes'][i])
+        yield _record(i, episode)
+
+
+def _record(index, episode):
+    player = [Deck.card_str(rank * 4) for rank in episode['player_cards'].tolist()]
+    dealer = [Deck.card_str(rank * 4) for rank in episode['dealer_cards'].tolist()]
+    new_cards = iter(player[2:])
+    return {
+        'index': index,
+        'player_hand': player[:2],
+        'dealer_hand': dealer,
+        'turns': [{'prev_action': ACTIONS[action],
+                   'new_card': next(new_cards) if action else None}
+                  for action in episode['actions'].tolist()],
+        'outcome': RESULTS[episode['outcome']],
+    }
+
+
+def generate_dataset(path, num_episodes: int, shard_size: int = 100000, seed=None,
+                     processes: int = None, hit_prob: float = 0.5, **rules) -> ShardedDataset:
+    """Generate a random-policy dataset as shards on a process pool.
+
+    Each worker plays one shard exactly as ``generate_sharded_episodes``
+    does and writes it to ``path/shard-XXXXX``; ``manifest.json`` then
+    stitches the shards together, so the dataset holds the same episodes as
+    ``generate_sharded_episodes`` with the same arguments, whatever
+    ``processes`` is.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest_path = path / MANIFEST_FILE
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    sizes = shard_sizes(num_episodes, shard_size)
+    metadata = {'seed': seed, 'shard_size': shard_size, 'hit_prob': hit_prob, 'rules': rules}
+    worker = partial(_write_shard, str(path), sizes, hit_prob, rules)
+    run_sharded(worker, len(sizes), seed=seed, processes=processes)
+
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': VERSION,
+        'num_episodes': num_episodes,
+        'shards': [{'path': _shard_name(i), 'num_episodes': size} for i, size in enumerate(sizes)],
+        'metadata': metadata,
+    }
+    tmp_path = path / f'{MANIFEST_FILE}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return ShardedDataset(path)
+
+
+def _write_shard(path, sizes, hit_prob, rules, index, seed):
+    episodes = generate_random_episodes(sizes[index], hit_prob=hit_prob, seed=seed, **rules)
+    write_dataset(Path(path) / _shard_name(index), episodes, {'shard': index})
+    return sizes[index]
+
+
+def _shard_name(index):
+    return f'shard-{index:05d}'
+
+
+def write_dataset(path, episodes: Dict[str, np.ndarray], metadata: Dict = None):
+    """Write an in-memory ``EPISODE_COLUMNS`` dict as a dataset directory."""
+    with EpisodeWriter(path, metadata) as writer:
+        writer.write(episodes)
+
+
+def convert_json(json_path, out_path, metadata: Dict = None):
+    """Convert a ``blackjack_data.json``-style record list to a columnar dataset.
+
+    Suits are dropped.
+    """
+    with open(json_path, encoding='utf-8') as f:
+        records = json.load(f)
+    write_dataset(out_path, episodes_from_records(records),
+                  {'source': str(json_path), **(metadata or {})})
+    return EpisodeDataset(out_path)
+
+
+def episodes_from_records(records) -> Dict[str, np.ndarray]:
+    """Records in the ``blackjack_data.json`` layout as an ``EPISODE_COLUMNS`` dict (suits dropped)."""
+    rank_of = {name: code >> 2 for code, name in enumerate(Deck.NAMES)}
+    action_of = {name: code for code, name in enumerate(ACTIONS)}
+    player_cards, dealer_cards, actions, outcomes = [], [], [], []
+    player_lengths, dealer_lengths, turn_lengths = [], [], []
+    for record in records:
+        turns = record['turns']
+        hand = [rank_of[card] for card in record['player_hand']]
+        hand += [rank_of[turn['new_card']] for turn in turns if turn['new_card']]
+        player_cards += hand
+        dealer_cards += [rank_of[card] for card in record['dealer_hand']]
+        actions += [action_of[turn['prev_action']] for turn in turns]
+        outcomes.append(RESULTS.index(record['outcome']))
+        player_lengths.append(len(hand))
+        dealer_lengths.append(len(record['dealer_hand']))
+        turn_lengths.append(len(turns))
+
+    episodes = {'player_cards': np.array(player_cards, dtype=np.int8),
+                'dealer_cards': np.array(dealer_cards, dtype=np.int8),
+                'actions': np.array(actions, dtype=np.int8),
+                'outcomes': np.array(outcomes, dtype=np.int8)}
+    for name, lengths in (('player_offsets', player_lengths), ('dealer_offsets', dealer_lengths),
+                          ('turn_offsets', turn_lengths)):
+        episodes[name] = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=episodes[name][1:])
+    return episodes
@@ -0,0 +1,119 @@
+import ast
+import os
+from functools import lru_cache
+from typing import Dict, Tuple
+import numpy as np
+from .blackjack import DEFAULT_MAX_HAND_VALUE, RANK_VALUES
+
+# Rule tuple -> exact dealer outcome table, shared by every caller in the process
+_OUTCOME_CACHE: Dict[Tuple, np.ndarray] = {}
+
+
+def dealer_outcomes(max_hand_value: int = DEFAULT_MAX_HAND_VALUE,
+                    force_ace_value: int = None,
+                    dealer_stick_threshold: int = 17,
+                    num_decks: int = 1,
+                    cache_path: str = None) -> np.ndarray:
+    """Exact distribution of the dealer's final total for every up-card.
+
+    Returns an array ``probs[up_card, total]`` where ``up_card`` is the value
+    the env reports as ``dealer_card``, ``total`` runs over 0..max_hand_value
+    and the last column holds the bust probability. Cards come from a shoe
+    of ``num_decks`` decks (``BlackjackEnv``'s default of 1 unless given)
+    minus the up-card, which is exact for a player who stands on their first
+    two cards; ``num_decks=None`` draws from an infinite deck instead.
+
+    Results are memoized per rule set. Passing ``cache_path`` also loads and
+    stores them in an ``.npz`` file so later processes skip the computation.
+    """
+    key = (max_hand_value, force_ace_value, dealer_stick_threshold, num_decks)
+    if key not in _OUTCOME_CACHE and cache_path is not None and os.path.exists(cache_path):
+        load_cache(cache_path)
+    if key not in _OUTCOME_CACHE:
+        _OUTCOME_CACHE[key] = _solve_dealer(*key)
+        if cache_path is not None:
+            save_cache(cache_path)
+    return _OUTCOME_CACHE[key]
+
+
+def stand_ev_table(outcomes: np.ndarray) -> np.ndarray:
+    """Expected reward of standing, indexed as ``ev[up_card, player_sum]``."""
+    finals = outcomes[:, :-1]
+    below = np.cumsum(finals, axis=1) - finals
+    above = finals.sum(axis=1, keepdims=True) - below - finals
+    return outcomes[:, -1:] + below - above
+
+
+def up_card_probs(force_ace_value: int = None) -> np.ndarray:
+    """Probability of each up-card value, aligned with the rows of ``dealer_outcomes``."""
+    values = list(RANK_VALUES)
+    if force_ace_value is not None:
+        values[0] = force_ace_value
+    return np.bincount(values, minlength=max(values) + 1) / len(values)
+
+
+def save_cache(path: str):
+    arrays = {repr(key): probs for key, probs in _OUTCOME_CACHE.items()}
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_cache(path: str):
+    with np.load(path) as data:
+        for name in data.files:
+            _OUTCOME_CACHE.setdefault(ast.literal_eval(name), data[name])
+
+
+def _solve_dealer(max_hand_value, force_ace_value, dealer_stick_threshold, num_decks) -> np.ndarray:
+    soft_aces = force_ace_value is None
+    bust = max_hand_value + 1
+
+    # Group ranks into (value, is_soft_ace) classes; 10/J/Q/K only differ by name
+    classes, class_of_rank = [], []
+    for rank, value in enumerate(RANK_VALUES):
+        if rank == 0 and force_ace_value is not None:
+            value = force_ace_value
+        card_class = (value, soft_aces and rank == 0)
+        if card_class not in classes:
+            classes.append(card_class)
+        class_of_rank.append(classes.index(card_class))
+    shoe = [0] * len(classes)
+    for index in class_of_rank:
+        shoe[index] += 4 * (num_decks or 1)
+    full_shoe = tuple(shoe)
+
+    def final_total(hard, has_ace):
+        total = hard + 10 if has_ace and hard + 10 <= max_hand_value else hard
+        if total < dealer_stick_threshold:
+            return None
+        return total if total <= max_hand_value else bust
+
+    @lru_cache(maxsize=None)
+    def play(counts, hard, has_ace):
+        total = final_total(hard, has_ace)
+        if total is not None:
+            return {total: 1.0}
+        remaining = sum(counts)
+        if remaining == 0:
+            # Deck.deal reshuffles a full shoe once it runs out
+            counts, remaining = full_shoe, sum(full_shoe)
+        dist = {}
+        for index, count in enumerate(counts):
+            if count == 0:
+                continue
+            value, is_ace = classes[index]
+            # An infinite deck never changes composition
+            drawn = counts if num_decks is None else counts[:index] + (count - 1,) + counts[index + 1:]
+            for total, p in play(drawn, hard + value, has_ace or is_ace).items():
+                dist[total] = dist.get(total, 0.0) + p * count / remaining
+        return dist
+
+    outcomes = np.zeros((max(value for value, _ in classes) + 1, max_hand_value + 2))
+    for index, (value, is_ace) in enumerate(classes):
+        counts = full_shoe
+        if num_decks is not None:
+            counts = full_shoe[:index] + (full_shoe[index] - 1,) + full_shoe[index + 1:]
+        for total, p in play(counts, value, is_ace).items():
+            outcomes[value, total] = p
+    return outcomes
@@ -1,37 +1,106 @@
-import random
-from typing import List
+from array import array
+from typing import Iterable, List
+from .rng import make_rng
+
+RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+SUITS = ['♠', '♥', '♦', '♣']
+CARD_NAMES = tuple(f"{rank}{suit}" for rank in RANKS for suit in SUITS)
+# Hi-Lo count tag per rank: +1 for 2-6, 0 for 7-9, -1 for 10-A
+HI_LO = (-1, 1, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1)
 
 
 class Deck:
-    RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
-    SUITS = ['♠', '♥', '♦', '♣']
-    
-    def __init__(self, num_decks: int = 1):
+    """Shoe of ``num_decks`` decks stored as integer card codes.
+
+    A card code is ``rank_index * 4 + suit_index`` into ``RANKS``/``SUITS``, so
+    ``code >> 2`` is the rank (0 = A ... 12 = K) and codes 0-3 are the aces.
+    The shoe lives in a preallocated byte buffer dealt from with a cursor, and
+    is shuffled lazily: each deal swaps a uniformly chosen undealt card into
+    the cursor slot (an incremental Fisher-Yates), so a hand only pays for the
+    cards it uses. Display strings are only built on request.
+
+    Setting ``penetration`` (fraction of the shoe) or ``cut_card`` (number of
+    cards) marks where a persistent shoe should be reshuffled; callers check
+    ``needs_shuffle()`` between hands. ``rank_counts`` holds the number of
+    cards of each rank dealt since the last shuffle, and ``shuffles`` counts
+    the shuffles so far (including the one ``deal`` does when the shoe runs
+    out mid-hand).
+
+    ``rng`` is a seed or random source accepted by ``make_rng``; the default
+    draws from the global ``random`` module.
+    """
+    RANKS = RANKS
+    SUITS = SUITS
+    NAMES = CARD_NAMES
+
+    def __init__(self, num_decks: int = 1, penetration: float = None, cut_card: int = None,
+                 rng=None):
         self.num_decks = num_decks
-        self.cards: List[str] = []
-        self.reset()
-    
+        self.rng = make_rng(rng)
+        self._ordered = array('B', range(len(self.NAMES))) * num_decks
+        self.codes = array('B', self._ordered)
+        self.position = 0
+        self.rank_counts = [0] * len(self.RANKS)
+        self.shuffles = 0
+
+        if cut_card is None and penetration is not None:
+            cut_card = int(round(penetration * len(self.codes)))
+        self.cut_card = cut_card
+
     def reset(self):
-        self.cards = []
-        for _ in range(self.num_decks):
-            for rank in self.RANKS:
-                for suit in self.SUITS:
-                    self.cards.append(f"{rank}{suit}")
-    
+        self.codes[:] = self._ordered
+        self.position = 0
+        self.rank_counts = [0] * len(self.RANKS)
+        self.shuffles += 1
+
     def shuffle(self):
-        self.reset()
-        random.shuffle(self.cards)
-    
-    def deal(self) -> str:
-        if len(self.cards) == 0:
+        # Every permutation of a full shoe is still a full shoe, so there is
+        # nothing to rebuild; the undealt part is randomized as it is dealt
+        self.position = 0
+        self.rank_counts = [0] * len(self.RANKS)
+        self.shuffles += 1
+
+    def needs_shuffle(self) -> bool:
+        return self.cut_card is not None and self.position >= self.cut_card
+
+    def running_count(self) -> int:
+        """Hi-Lo running count of the cards dealt since the last shuffle."""
+        return sum(tag * count for tag, count in zip(HI_LO, self.rank_counts))
+
+    def deal(self) -> int:
+        codes, position = self.codes, self.position
+        if position >= len(codes):
             self.shuffle()
-        return self.cards.pop()
-    
+            position = 0
+        swap = position + int(self.rng.random() * (len(codes) - position))
+        code = codes[swap]
+        codes[swap] = codes[position]
+        codes[position] = code
+        self.position = position + 1
+        self.rank_counts[code >> 2] += 1
+        return code
+
+    def remaining_codes(self) -> array:
+        return self.codes[self.position:]
+
+    @property
+    def cards(self) -> List[str]:
+        """Display strings of the cards still in the shoe."""
+        return self.card_strs(self.remaining_codes())
+
+    @classmethod
+    def card_str(cls, code: int) -> str:
+        return cls.NAMES[code]
+
+    @classmethod
+    def card_strs(cls, codes: Iterable[int]) -> List[str]:
+        return [cls.NAMES[code] for code in codes]
+
     def cards_remaining(self) -> int:
-        return len(self.cards)
-    
+        return len(self.codes) - self.position
+
     def __len__(self) -> int:
-        return len(self.cards)
-    
+        return self.cards_remaining()
+
     def __repr__(self) -> str:
-        return f"Deck(num_decks={self.num_decks}, cards_remaining={len(self.cards)})"
\ No newline at end of file
+        return f"Deck(num_decks={self.num_decks}, cards_remaining={self.cards_remaining()}, cut_card={self.cut_card})"
@@ -0,0 +1,95 @@
+from functools import partial
+from typing import Dict, List
+import numpy as np
+from .batch import BatchBlackjackEnv, flatten_columns, RESULTS
+from .rng import run_sharded
+
+# Columns produced for every batch of episodes. Cards are rank codes
+# (0 = A ... 12 = K), actions are 1 = hit / 0 = stand, outcomes index RESULTS.
+EPISODE_COLUMNS = ('player_cards', 'player_offsets', 'dealer_cards', 'dealer_offsets',
+                   'actions', 'turn_offsets', 'outcomes')
+
+
+def generate_random_episodes(num_episodes: int, hit_prob: float = 0.5,
+                             chunk_size: int = 1_000_000, seed=None,
+                             **rules) -> Dict[str, np.ndarray]:
+    """Play ``num_episodes`` random-policy games straight into flat arrays.
+
+    Each turn hits with probability ``hit_prob``, like the HMM data scripts.
+    ``player_cards[player_offsets[i]:player_offsets[i + 1]]`` is episode i's
+    full hand (the two initial cards then one card per hit), and likewise for
+    the dealer's hand and the per-turn ``actions``. ``rules`` are passed to
+    ``BatchBlackjackEnv``. Games are simulated ``chunk_size`` at a time.
+    """
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for start in range(0, num_episodes, chunk_size):
+        size = min(chunk_size, num_episodes - start)
+        env = BatchBlackjackEnv(size, seed=rng, record_cards=True, **rules)
+        env.reset()
+
+        action_columns = []
+        while not env.done.all():
+            actions = (rng.random(size) < hit_prob).astype(np.int8)
+            actions[env.done] = -1
+            action_columns.append(actions)
+            env.step(actions)
+
+        player_cards, player_offsets = flatten_columns(env.player_cards)
+        dealer_cards, dealer_offsets = flatten_columns(env.dealer_cards)
+        actions, turn_offsets = flatten_columns(action_columns)
+        chunks.append({'player_cards': player_cards, 'player_offsets': player_offsets,
+                       'dealer_cards': dealer_cards, 'dealer_offsets': dealer_offsets,
+                       'actions': actions, 'turn_offsets': turn_offsets,
+                       'outcomes': env.result.copy()})
+    return concatenate_episodes(chunks)
+
+
+def generate_sharded_episodes(num_episodes: int, shard_size: int = 100000, seed=None,
+                              processes: int = None, hit_prob: float = 0.5,
+                              **rules) -> Dict[str, np.ndarray]:
+    """``generate_random_episodes`` fanned out over a process pool.
+
+    Shard i (episodes ``[i * shard_size, (i + 1) * shard_size)``) is played
+    from the i-th ``SeedSequence`` child of ``seed``, so the result depends
+    on ``seed`` and ``shard_size`` but not on ``processes``.
+    """
+    sizes = shard_sizes(num_episodes, shard_size)
+    worker = partial(_generate_shard, sizes, hit_prob, rules)
+    return concatenate_episodes(run_sharded(worker, len(sizes), seed=seed, processes=processes))
+
+
+def _generate_shard(sizes, hit_prob, rules, index, seed):
+    return generate_random_episodes(sizes[index], hit_prob=hit_prob, seed=seed, **rules)
+
+
+def shard_sizes(num_episodes: int, shard_size: int) -> List[int]:
+    """Episodes per shard when ``num_episodes`` are split into ``shard_size`` pieces."""
+    return [min(shard_size, num_episodes - start) for start in range(0, num_episodes, shard_size)]
+
+
+def concatenate_episodes(chunks) -> Dict[str, np.ndarray]:
+    """Join episode column dicts, shifting each chunk's offsets."""
+    if not chunks:
+        return empty_episodes()
+    episodes = {}
+    for name in EPISODE_COLUMNS:
+        if name.endswith('_offsets'):
+            parts, base = [np.zeros(1, dtype=np.int64)], 0
+            for chunk in chunks:
+                parts.append(chunk[name][1:] + base)
+                base += chunk[name][-1]
+            episodes[name] = np.concatenate(parts)
+        else:
+            episodes[name] = np.concatenate([chunk[name] for chunk in chunks])
+    return episodes
+
+
+def empty_episodes() -> Dict[str, np.ndarray]:
+    return {name: np.zeros(1, dtype=np.int64) if name.endswith('_offsets')
+            else np.zeros(0, dtype=np.int8) for name in EPISODE_COLUMNS}
+
+
+def outcome_names(outcomes: np.ndarray) -> np.ndarray:
+    """Map outcome codes back to the env's result strings."""
+    return np.array(RESULTS)[outcomes]
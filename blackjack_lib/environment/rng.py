@@ -0,0 +1,102 @@
+import random
+import multiprocessing
+from typing import Callable, List
+import numpy as np
+
+
+class GlobalRandom:
+    """Stateless handle on the module-level ``random`` functions (the default)."""
+
+    def random(self) -> float:
+        return random.random()
+
+    def choice(self, seq):
+        return random.choice(seq)
+
+    def shuffle(self, x):
+        random.shuffle(x)
+
+    def getstate(self):
+        return random.getstate()
+
+    def setstate(self, state):
+        random.setstate(state)
+
+
+class GeneratorRandom:
+    """Adapts a ``numpy.random.Generator`` to the ``random.Random`` methods we use."""
+
+    def __init__(self, generator: np.random.Generator):
+        self.generator = generator
+
+    def random(self) -> float:
+        return float(self.generator.random())
+
+    def choice(self, seq):
+        return seq[int(self.generator.integers(len(seq)))]
+
+    def shuffle(self, x):
+        self.generator.shuffle(x)
+
+    def getstate(self):
+        return self.generator.bit_generator.state
+
+    def setstate(self, state):
+        self.generator.bit_generator.state = state
+
+
+def make_rng(seed=None):
+    """Turn a seed into an object with ``random()``, ``choice()`` and ``shuffle()``.
+
+    ``None`` keeps using the global ``random`` module. ``random.Random`` and
+    ``numpy.random.Generator`` instances are used as given; ints and
+    ``numpy.random.SeedSequence`` objects seed a new ``random.Random``.
+    """
+    if seed is None:
+        return GlobalRandom()
+    if isinstance(seed, (random.Random, GlobalRandom, GeneratorRandom)):
+        return seed
+    if isinstance(seed, np.random.Generator):
+        return GeneratorRandom(seed)
+    if isinstance(seed, np.random.SeedSequence):
+        return random.Random(int(seed.generate_state(1, np.uint64)[0]))
+    return random.Random(seed)
+
+
+def make_generator(seed=None) -> np.random.Generator:
+    """NumPy counterpart of ``make_rng`` for the vectorized code paths."""
+    if isinstance(seed, GeneratorRandom):
+        return seed.generator
+    if isinstance(seed, random.Random):
+        return np.random.default_rng(seed.getrandbits(128))
+    if isinstance(seed, GlobalRandom):
+        return np.random.default_rng(random.getrandbits(128))
+    return np.random.default_rng(seed)
+
+
+def spawn_rngs(seed, n: int) -> List:
+    """``n`` independent streams derived from ``seed`` via ``SeedSequence``.
+
+    Seeds that are already generators (or ``None``) cannot be split
+    reproducibly, so the same stream is shared ``n`` times.
+    """
+    if seed is None or isinstance(seed, (random.Random, GlobalRandom, GeneratorRandom,
+                                         np.random.Generator)):
+        return [make_rng(seed)] * n
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [make_rng(child) for child in seed.spawn(n)]
+
+
+def run_sharded(fn: Callable, num_shards: int, seed=None, processes: int = None) -> List:
+    """Call ``fn(shard_index, shard_seed)`` for every shard and return results in shard order.
+
+    Each shard's ``SeedSequence`` depends only on ``seed`` and its index, so
+    the combined result is identical whatever the number of processes.
+    ``fn`` must be a picklable, module-level function.
+    """
+    shard_seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    if processes == 1:
+        return [fn(index, shard_seed) for index, shard_seed in enumerate(shard_seeds)]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.starmap(fn, enumerate(shard_seeds))
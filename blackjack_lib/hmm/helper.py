@@ -1,6 +1,9 @@
 from typing import Literal
-from seqlearn.hmm import MultinomialHMM
-from blackjack_lib.environment.blackjack import BlackjackEnv
+from blackjack_lib.hmm.multinomial import MultinomialHMM
+from blackjack_lib.environment.blackjack import BlackjackEnv, RANK_VALUES
+from blackjack_lib.environment.batch import RESULTS
+from blackjack_lib.environment.deck import Deck
+from blackjack_lib.environment.dataset import episodes_from_records
 import json
 import numpy as np
 from tqdm import tqdm
@@ -32,63 +35,91 @@ def description_to_state(desc: Literal['hit', 'stand']):
     descs = ['hit', 'stand']
     return descs.index(desc)
 
+# Lookup tables for process_data: card_to_index per rank code, state per
+# action code (0 = stand, 1 = hit) and final special emission per RESULTS code
+RANK_INDEX = np.array(RANK_VALUES, dtype=np.int64)
+ACTION_STATE = np.array([description_to_state('stand'), description_to_state('hit')])
+OUTCOME_SPECIAL = np.array([special_to_index('lose') if result in ('dealer_win', 'player_bust')
+                            else special_to_index('draw') if result == 'draw'
+                            else special_to_index('win') for result in RESULTS])
+
 def process_data(data):
-    emissions = []
-    states = []
-    lengths = []
-    for sample in tqdm(data):
-        cur_emissions = []
-        cur_states = []
+    # data: blackjack_data.json records, an episode dataset or an EPISODE_COLUMNS dict
+    if hasattr(data, 'take'):
+        data = data.take(np.arange(len(data)))
+    elif not isinstance(data, dict):
+        data = episodes_from_records(data)
+    emissions, states, lengths = encode_episodes(data)
+    return emissions, states, lengths.tolist()
+
+def encode_episodes(episodes):
+    # one emission [player_sum, dealer_up_card, special] and state per turn, all episodes at once
+    turn_offsets = episodes['turn_offsets']
+    lengths = np.diff(turn_offsets)
+    actions = np.asarray(episodes['actions'], dtype=np.int64)
+    episode_of_turn = np.repeat(np.arange(len(lengths)), lengths)
+
+    # player sum: first two cards, then each hit adds the next card of the hand
+    values = RANK_INDEX[episodes['player_cards']]
+    hand_starts = episodes['player_offsets'][:-1]
+    drawn = np.ones(len(values), dtype=bool)
+    drawn[hand_starts] = False
+    drawn[hand_starts + 1] = False
+    added = np.zeros(len(actions), dtype=np.int64)
+    added[actions == 1] = values[drawn]
+    running = np.cumsum(added)
+    before = np.concatenate(([0], running))[turn_offsets[:-1]]
+    player_sums = values[hand_starts] + values[hand_starts + 1] - before
 
-        cur_player_sum = card_to_index(sample['player_hand'][0])+card_to_index(sample['player_hand'][1])
-        dealer_up_card = card_to_index(sample['dealer_hand'][0])
-        # get turn states and emissions
-        for turn in sample['turns']:
-            cur_states.append(description_to_state(turn['prev_action']))
-            if turn['new_card']:
-                cur_player_sum += card_to_index(turn['new_card'])
-            cur_emissions.append([cur_player_sum, dealer_up_card, special_to_index('cont')])
+    emissions = np.empty((len(actions), 3), dtype=np.int64)
+    emissions[:, 0] = player_sums[episode_of_turn] + running
+    emissions[:, 1] = RANK_INDEX[episodes['dealer_cards'][episodes['dealer_offsets'][:-1]]][episode_of_turn]
+    emissions[:, 2] = special_to_index('cont')
+    # the last turn's special is the outcome
+    played = lengths > 0
+    emissions[turn_offsets[1:][played] - 1, 2] = OUTCOME_SPECIAL[episodes['outcomes'][played]]
 
-        # get last emission
-        special = 'win'
-        if sample['outcome'] == 'dealer_win' or sample['outcome'] == 'player_bust':
-            special = 'lose'
-        elif sample['outcome'] == 'draw':
-            special = 'draw'
-        cur_emissions[-1][2] = special_to_index(special)
+    return emissions, ACTION_STATE[actions], lengths
 
-        states.extend(cur_states)
-        emissions.extend(cur_emissions)
-        lengths.append(len(cur_states))
 
-    states = np.array(states)
-    emissions = np.array(emissions)
-    return emissions, states, lengths
+def lookahead_action(mhmm, env, cur_emissions, player_sum, dealer_up_card):
+    # vote over every possible card in deck (card counting) plus the dealer's hole card:
+    # each card's vote is the first predicted state given a winning emission after drawing it.
+    # Cards of equal value give the same sequence, so each value is decoded once (all of them
+    # in one padded batch) and its vote weighted by the number of such cards.
+    codes = np.frombuffer(env.deck.remaining_codes(), dtype=np.uint8)
+    counts = np.bincount(RANK_INDEX[codes >> 2], minlength=RANK_INDEX.max() + 1)
+    counts[RANK_INDEX[env.dealer_hand[1] >> 2]] += 1
+    values = np.flatnonzero(counts)
 
+    length = len(cur_emissions) + 1
+    prospective_emissions = np.empty((len(values), length, 3), dtype=np.int64)
+    prospective_emissions[:, :-1] = np.reshape(cur_emissions, (-1, 3))
+    prospective_emissions[:, -1, 0] = player_sum + values
+    prospective_emissions[:, -1, 1] = dealer_up_card
+    prospective_emissions[:, -1, 2] = special_to_index('win')
+    first_states = mhmm.predict(prospective_emissions)[:, 0]
+    actions = int(np.dot(counts[values], first_states))
+    return 1 if actions / counts.sum() >= 0.5 else 0
 
-def test_hmm(N_rounds, emissions, states, lengths):
+def test_hmm(N_rounds, emissions, states, lengths, verbose=False):
     mhmm = MultinomialHMM()
     mhmm.fit(emissions, states, lengths=lengths)
+    if verbose:
+        print(np.exp(mhmm.intercept_trans_))
     env = BlackjackEnv()
     wins = 0
     draws = 0
     for _ in tqdm(range(N_rounds)):
         env.reset()
         cur_emissions = []
-        dealer_up_card = card_to_index(env.dealer_hand[0])
-        player_sum = card_to_index(env.player_hand[0])+card_to_index(env.player_hand[1])
+        dealer_up_card = card_to_index(Deck.card_str(env.dealer_hand[0]))
+        player_sum = card_to_index(Deck.card_str(env.player_hand[0]))+card_to_index(Deck.card_str(env.player_hand[1]))
         while not env.game_over:
-            actions = 0
-            total = 0
-            # get every possible card in deck (card counting):
-            for card in env.deck.cards + [env.dealer_hand[1]]:
-                prospective_emissions = cur_emissions + [[player_sum+card_to_index(card), dealer_up_card, special_to_index('win')]]
-                actions += mhmm.predict(np.array(prospective_emissions))[0]
-                total += 1
-            action = 1 if actions / total >= 0.5 else 0
+            action = lookahead_action(mhmm, env, cur_emissions, player_sum, dealer_up_card)
             # action = 0 if action else 1 # flip action since we predicted lose
             _, _, _, info = env.step(action)
-            player_sum += card_to_index(env.player_hand[-1])
+            player_sum += card_to_index(Deck.card_str(env.player_hand[-1]))
             cur_emissions.append([player_sum, dealer_up_card, special_to_index('cont')])
 
         wins += 1 if (info['result'] == 'player_win' or info['result'] == 'dealer_bust') else 0
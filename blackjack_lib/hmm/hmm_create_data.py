@@ -1,44 +1,14 @@
-from blackjack_lib.environment.blackjack import BlackjackEnv
-from random import random
-from copy import deepcopy
-import json
-from pathlib import Path
-from tqdm import tqdm
+from blackjack_lib.environment.dataset import generate_dataset
 
-OUT_PATH = Path('blackjack_data.json')
+OUT_PATH = 'blackjack_data'
 N_points = 500000
-
-# Create environment
-env = BlackjackEnv()
-
-# Create dataset
-dataset = []
-for data_index in tqdm(range(N_points)):
-    # Reset results and environment
-    results = {}
-    env.reset()
-
-    # Update current datapoint index and dealer hand
-    results['index'] = data_index
-    results['dealer_hand'] = env.dealer_hand
-    results['player_hand'] = deepcopy(env.player_hand)
-
-    # Update player hands
-    turns = []
-    while not env.game_over:
-        decision = random() >= 0.5 # stand / hold with equal probability
-        _, _, _, info = env.step(decision)
-        turn = {
-            'prev_action': 'hit' if decision else 'stand',
-            'new_card': env.player_hand[-1] if decision else None
-        }
-        turns.append(turn)
-
-    # add final hand and outcome
-    results['turns'] = turns
-    results['outcome'] = info['result']
-
-    dataset.append(results)
-
-# Dump results
-json.dump(dataset, OUT_PATH.open('w'), ensure_ascii=False)
\ No newline at end of file
+SEED = 0
+
+# Create dataset: random-policy games (hit / stand with equal probability),
+# played in seeded shards on a process pool and written in the columnar
+# format (see environment.dataset). The episodes depend only on SEED, not on
+# the number of workers. Older blackjack_data.json files can be converted
+# with dataset.convert_json.
+if __name__ == '__main__':
+    dataset = generate_dataset(OUT_PATH, N_points, seed=SEED, hit_prob=0.5)
+    print(f"Wrote {len(dataset)} episodes in {len(dataset.shards)} shards to {OUT_PATH}")
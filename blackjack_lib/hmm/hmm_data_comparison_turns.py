@@ -8,10 +8,10 @@ import sys
 import pathlib
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
 
-from blackjack_lib.environment.blackjack import BlackjackEnv
+from blackjack_lib.environment.episodes import generate_sharded_episodes, concatenate_episodes
+from blackjack_lib.environment.dataset import take_episodes
 from helper import process_data, test_hmm
-import random
-from copy import deepcopy
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from typing import List
@@ -22,77 +22,65 @@ from matplotlib import pyplot as plt
 import json
 import time
 
-def compose_data(num_turns: List[int], N_points = 50000):
+def compose_data(num_turns: List[int], N_points = 50000, seed=None, processes=None):
+    """
+    Random-policy games whose number of turns is in num_turns, in generation order,
+    as an EPISODE_COLUMNS dict.
+    Games are played in sharded rounds on a process pool (see environment.episodes);
+    for a given seed the dataset does not depend on the number of processes.
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    kept = []
+    needed, accept_rate, round_index = N_points, 1.0, 0
+    while needed > 0:
+        # Size each round from the acceptance rate seen so far
+        num_games = max(int(needed / accept_rate * 1.1), 1000)
+        episodes = generate_sharded_episodes(num_games, seed=[entropy, round_index],
+                                             processes=processes)
+        turns = np.diff(episodes['turn_offsets'])
+        matches = np.flatnonzero(np.isin(turns, num_turns))
+        accept_rate = max(len(matches) / num_games, 1e-4)
+        kept.append(take_episodes(episodes, matches[:needed]))
+        needed -= len(kept[-1]['outcomes'])
+        round_index += 1
 
-    # Create environment
-    env = BlackjackEnv()
+    return concatenate_episodes(kept)
 
-    # Create dataset
-    dataset = []
-    for data_index in tqdm(range(N_points)):
-        while True:
-            # Reset results and environment
-            results = {}
-            env.reset()
+# Guarded: compose_data starts a process pool, whose workers may re-import this script
+if __name__ == '__main__':
+    # run simulation with different percentages of wins
+    df = []
+    for i, n_turns in tqdm(enumerate([[1], [2], [3], [1,2], [2,3], [1,2,3]])):
+        stats = {}
+        simulation = compose_data(n_turns, N_points=500000)
+        simulation = take_episodes(simulation, np.random.permutation(len(simulation['outcomes'])))
+        emissions, states, lengths = process_data(simulation)
 
-            # Update current datapoint index and dealer hand
-            results['index'] = data_index
-            results['dealer_hand'] = env.dealer_hand
-            results['player_hand'] = deepcopy(env.player_hand)
+        stats["n_turns"] = i
+        start_time = time.perf_counter()
+        winrate, drawrate = test_hmm(10000, emissions, states, lengths)
+        end_time = time.perf_counter()
+        stats["winrate"] = winrate
+        stats["drawrate"] = drawrate
+        stats['time'] = end_time - start_time
+        df.append(stats)
 
-            # Update player hands
-            turns = []
-            while not env.game_over:
-                decision = random.random() >= 0.5 # stand / hold with equal probability
-                _, _, _, info = env.step(decision)
-                turn = {
-                    'prev_action': 'hit' if decision else 'stand',
-                    'new_card': env.player_hand[-1] if decision else None
-                }
-                turns.append(turn)
+    json.dump(df, open('stats.json', 'w'), indent=4)
 
-            # add final hand and outcome
-            results['turns'] = turns
-            results['outcome'] = info['result']
-            if len(turns) in num_turns:
-                dataset.append(results)
-                break
+    results = pd.DataFrame(df)
+    # Plot win rate vs training win percentage
+    plt.figure(figsize=(8, 5))
+    plt.plot(results["n_turns"], results["winrate"], marker="o", linewidth=2)
+    plt.xticks(results['n_turns'], ['1', '2', '3', '1 & 2', '2 & 3', '1 & 2 & 3'])
+    plt.xlabel("Training Set Num Turns")
+    plt.ylabel("HMM Win Rate")
+    plt.title("Effect of Turn Composition on HMM Performance")
+    plt.savefig("figures/hmm_winrate_vs_training_winpct.png")
 
-    return dataset
-
-# run simulation with different percentages of wins
-df = []
-for i, n_turns in tqdm(enumerate([[1], [2], [3], [1,2], [2,3], [1,2,3]])):
-    stats = {}
-    simulation = compose_data(n_turns, N_points=500000)
-    random.shuffle(simulation)
-    emissions, states, lengths = process_data(simulation)
-
-    stats["n_turns"] = i
-    start_time = time.perf_counter()
-    winrate, drawrate = test_hmm(10000, emissions, states, lengths)
-    end_time = time.perf_counter()
-    stats["winrate"] = winrate
-    stats["drawrate"] = drawrate
-    stats['time'] = end_time - start_time
-    df.append(stats)
-
-json.dump(df, open('stats.json', 'w'), indent=4)
-
-results = pd.DataFrame(df)
-# Plot win rate vs training win percentage
-plt.figure(figsize=(8, 5))
-plt.plot(results["n_turns"], results["winrate"], marker="o", linewidth=2)
-plt.xticks(results['n_turns'], ['1', '2', '3', '1 & 2', '2 & 3', '1 & 2 & 3'])
-plt.xlabel("Training Set Num Turns")
-plt.ylabel("HMM Win Rate")
-plt.title("Effect of Turn Composition on HMM Performance")
-plt.savefig("figures/hmm_winrate_vs_training_winpct.png")
-
-# Optional: Plot draw rate too
-plt.figure(figsize=(8, 5))
-plt.plot(results["n_turns"], results["drawrate"], marker="o", linewidth=2, color="orange")
-plt.xlabel("Training Set Num Turns")
-plt.ylabel("HMM Draw Rate")
-plt.title("Effect of Turn Composition on HMM Draw Rate")
-plt.savefig("figures/hmm_drawrate_vs_training_winpct.png")
\ No newline at end of file
+    # Optional: Plot draw rate too
+    plt.figure(figsize=(8, 5))
+    plt.plot(results["n_turns"], results["drawrate"], marker="o", linewidth=2, color="orange")
+    plt.xlabel("Training Set Num Turns")
+    plt.ylabel("HMM Draw Rate")
+    plt.title("Effect of Turn Composition on HMM Draw Rate")
+    plt.savefig("figures/hmm_drawrate_vs_training_winpct.png")
@@ -0,0 +1,176 @@
+import numpy as np
+
+DECODERS = ('viterbi', 'bestfirst')
+
+
+class MultinomialHMM:
+    """Supervised first-order HMM, a drop-in for ``seqlearn.hmm.MultinomialHMM``.
+
+    ``fit`` estimates the same Lidstone-smoothed (``alpha``) count parameters
+    as seqlearn 0.2 from ``(X, y, lengths)``, including its quirks: each
+    feature column is normalized over the classes, transitions are counted
+    across sequence boundaries and normalized over the source state, and
+    the final-state weights are counted from the first sample of each
+    sequence. A sample's class scores are ``X @ coef_.T``.
+
+    Sequences are given offset-indexed (``X`` of shape ``(n_samples,
+    n_features)`` and ``lengths`` summing to at most ``n_samples``) or
+    padded (``X`` of shape ``(n_sequences, max_length, n_features)`` with
+    optional ``lengths``; outputs are then padded with -1 / NaN). Decoding
+    runs in log space for every sequence at once, one time step at a time.
+    ``predict`` is Viterbi (or seqlearn's greedy 'bestfirst'), and
+    ``predict_proba`` / ``log_likelihood`` use the forward recursion.
+    """
+
+    def __init__(self, decode='viterbi', alpha=.01):
+        self.decode = decode
+        self.alpha = alpha
+
+    def fit(self, X, y, lengths):
+        alpha = self.alpha
+        if alpha <= 0:
+            raise ValueError(f"alpha should be >0, got {alpha!r}")
+
+        X = np.atleast_2d(np.asarray(X))
+        classes, y = np.unique(y, return_inverse=True)
+        y = y.ravel()
+        lengths = np.asarray(lengths)
+        Y = y.reshape(-1, 1) == np.arange(len(classes))
+
+        end = np.cumsum(lengths)
+        start = end - lengths
+
+        init_prob = np.log(Y[start].sum(axis=0) + alpha)
+        init_prob -= _logsumexp(init_prob)
+        final_prob = np.log(Y[start].sum(axis=0) + alpha)
+        final_prob -= _logsumexp(final_prob)
+
+        feature_prob = np.log(np.dot(Y.T, X) + alpha)
+        feature_prob -= _logsumexp(feature_prob, axis=0)
+
+        n_classes = len(classes)
+        trans = np.bincount(y[:-1] * n_classes + y[1:], minlength=n_classes ** 2)
+        trans_prob = np.log(trans.reshape(n_classes, n_classes) + alpha)
+        trans_prob -= _logsumexp(trans_prob, axis=0)
+
+        self.coef_ = feature_prob
+        self.intercept_init_ = init_prob
+        self.intercept_final_ = final_prob
+        self.intercept_trans_ = trans_prob
+        self.classes_ = classes
+        return self
+
+    def predict(self, X, lengths=None):
+        """Most likely class of every sample, per sequence."""
+        if self.decode not in DECODERS:
+            raise ValueError(f"Unknown decoder {self.decode!r}")
+        X, lengths, padded = _flatten(X, lengths)
+        scores, start = self._scores(X, lengths)
+        if self.decode == 'viterbi':
+            path = self._viterbi(scores, start, lengths)
+        else:
+            path = self._bestfirst(scores, start, lengths)
+        return _unflatten(self.classes_[path], padded, -1)
+
+    def predict_proba(self, X, lengths=None):
+        """Filtered class probabilities ``p(y_t | x_1..x_t)`` of every sample.
+
+        The final-state weight enters at each sequence's last sample, so
+        there the filtered and smoothed posteriors coincide.
+        """
+        X, lengths, padded = _flatten(X, lengths)
+        scores, start = self._scores(X, lengths)
+        log_alpha = self._forward(scores, start, lengths)
+        proba = np.exp(log_alpha - _logsumexp(log_alpha, axis=1)[:, None])
+        return _unflatten(proba, padded, np.nan)
+
+    def log_likelihood(self, X, lengths=None):
+        """Log of the summed path scores of each sequence."""
+        X, lengths, _ = _flatten(X, lengths)
+        scores, start = self._scores(X, lengths)
+        log_alpha = self._forward(scores, start, lengths)
+        return _logsumexp(log_alpha[start + lengths - 1], axis=1)
+
+    def _scores(self, X, lengths):
+        if np.any(lengths < 1):
+            raise ValueError("Sequences must have at least one sample")
+        end = np.cumsum(lengths)
+        if len(end) and end[-1] > X.shape[0]:
+            raise ValueError(f"More than {X.shape[0]} samples in lengths array {lengths}")
+        start = end - lengths
+        scores = np.dot(X[:end[-1] if len(end) else 0], self.coef_.T)
+        return scores, start
+
+    def _viterbi(self, scores, start, lengths):
+        trans, final = self.intercept_trans_, self.intercept_final_
+        n_samples, n_states = scores.shape
+        # Same operation order and first-max tie-breaking as seqlearn's decoder
+        delta = scores[start] + self.intercept_init_
+        backp = np.zeros((n_samples, n_states), dtype=np.intp)
+        for t in range(1, int(lengths.max(initial=0))):
+            live = np.flatnonzero(lengths > t)
+            rows = start[live] + t
+            candidates = delta[live][:, :, None] + trans + scores[rows][:, None, :]
+            backp[rows] = candidates.argmax(axis=1)
+            delta[live] = candidates.max(axis=1)
+
+        path = np.empty(n_samples, dtype=np.intp)
+        last = start + lengths - 1
+        path[last] = (delta + final).argmax(axis=1)
+        for t in range(int(lengths.max(initial=0)) - 2, -1, -1):
+            live = np.flatnonzero(lengths > t + 1)
+            rows = start[live] + t
+            path[rows] = backp[rows + 1, path[rows + 1]]
+        return path
+
+    def _bestfirst(self, scores, start, lengths):
+        trans = self.intercept_trans_
+        scores = scores.copy()
+        scores[start] += self.intercept_init_
+        scores[start + lengths - 1] += self.intercept_final_
+        path = np.empty(len(scores), dtype=np.intp)
+        path[start] = scores[start].argmax(axis=1)
+        for t in range(1, int(lengths.max(initial=0))):
+            rows = start[lengths > t] + t
+            path[rows] = (trans[path[rows - 1]] + scores[rows]).argmax(axis=1)
+        return path
+
+    def _forward(self, scores, start, lengths):
+        trans = self.intercept_trans_
+        log_alpha = np.empty_like(scores)
+        log_alpha[start] = scores[start] + self.intercept_init_
+        for t in range(1, int(lengths.max(initial=0))):
+            rows = start[lengths > t] + t
+            log_alpha[rows] = _logsumexp(log_alpha[rows - 1][:, :, None] + trans, axis=1) + scores[rows]
+        log_alpha[start + lengths - 1] += self.intercept_final_
+        return log_alpha
+
+
+def _logsumexp(a, axis=None):
+    a_max = np.max(a, axis=axis, keepdims=True)
+    a_max[~np.isfinite(a_max)] = 0
+    out = np.log(np.sum(np.exp(a - a_max), axis=axis, keepdims=True)) + a_max
+    return out.squeeze() if axis is None else np.squeeze(out, axis=axis)
+
+
+def _flatten(X, lengths):
+    # Padded (n_sequences, max_length, n_features) input -> offset-indexed rows
+    X = np.asarray(X)
+    if X.ndim == 3:
+        n_sequences, max_length = X.shape[:2]
+        if lengths is None:
+            lengths = np.full(n_sequences, max_length)
+        lengths = np.asarray(lengths, dtype=np.intp)
+        mask = np.arange(max_length) < lengths[:, None]
+        return X[mask], lengths, mask
+    X = np.atleast_2d(X)
+    lengths = np.asarray([X.shape[0]] if lengths is None else lengths, dtype=np.intp)
+    return X, lengths, None
+
+
+def _unflatten(values, mask, fill):
+    if mask is None:
+        return values
+    out = np.full(mask.shape + values.shape[1:], fill, dtype=np.result_type(values, fill))
+    out[mask] = values
+    return out
@@ -6,57 +6,24 @@ import matplotlib.pyplot as plt
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from blackjack_lib.agents.Q_agent import QAgent
+from blackjack_lib.agents.evaluation import evaluate_policy, compare_policies
+from blackjack_lib.environment.dealer import dealer_outcomes, up_card_probs
 
 
 def run_continuous_evaluation(agent, start_game_num, num_games=10000, eval_interval=1000):
     """
     Runs evaluation (epsilon=0) and tracks BOTH Win Rate and Average Reward.
     """
-    history = {
-        'game_numbers': [],
-        'win_rates': [],
-        'rewards': []
-    }
-
-    wins = 0
-    total_reward = 0
-    games_count = 0
-
-    for i in range(num_games):
-        state = agent.env.reset()
-        done = False
-        episode_reward = 0
-
-        while not done:
-            # Pure Greedy Strategy (No Noise)
-            action = agent.pick_action(state, epsilon=0.0)
-            state, reward, done, info = agent.env.step(action)
-            episode_reward += reward
-
-        if episode_reward > 0:
-            wins += 1
-
-        total_reward += episode_reward
-        games_count += 1
-
-        # Record stats at intervals
-        if games_count >= eval_interval:
-            current_game_idx = start_game_num + (i + 1)
-
-            # Calculate averages for this specific window
-            win_rate = wins / games_count
-            avg_reward = total_reward / games_count
-
-            history['game_numbers'].append(current_game_idx)
-            history['win_rates'].append(win_rate)
-            history['rewards'].append(avg_reward)
+    # Pure Greedy Strategy (No Noise), played in batches
+    history = evaluate_policy(agent, num_games=num_games, eval_interval=eval_interval)['history']
+    history['game_numbers'] = [start_game_num + g for g in history['game_numbers']]
+    return history
 
-            # Reset counters
-            wins = 0
-            total_reward = 0
-            games_count = 0
 
-    return history
+def exact_dealer_bust_rate(max_hand_value=21, force_ace_value=None, dealer_stick_threshold=17):
+    """Analytic dealer bust probability for a rule set (single deck)."""
+    outcomes = dealer_outcomes(max_hand_value, force_ace_value, dealer_stick_threshold, num_decks=1)
+    return float(up_card_probs(force_ace_value) @ outcomes[:, -1])
 
 
 def run_full_experiment(name, max_hand_value=21, force_ace_value=None,
@@ -89,7 +56,7 @@ def run_full_experiment(name, max_hand_value=21, force_ace_value=None,
     )
 
     print("Done.")
-    return train_history, eval_history
+    return train_history, eval_history, agent
 
 
 def plot_combined_results(results_map, train_end_point=50000, save_path=None):
@@ -164,35 +131,42 @@ def main():
     EVAL_EPISODES = 10000
 
     results = {}
+    agents = {}
+    variations = {
+        "Baseline": dict(max_hand_value=21, dealer_stick_threshold=17),
+        "Fair Scaled": dict(max_hand_value=25, dealer_stick_threshold=21),
+        "Hard Ace": dict(max_hand_value=21, force_ace_value=1),
+    }
 
     print(f"\n{'=' * 70}")
     print(f"ABLATION STUDY (SMOOTH + LINKED PLOTS)")
     print(f"{'=' * 70}\n")
 
-    # 1. Baseline
-    name = "Baseline"
-    results[name] = run_full_experiment(name, max_hand_value=21, dealer_stick_threshold=17,
-                                        train_episodes=TRAIN_EPISODES, eval_episodes=EVAL_EPISODES)
+    for name, rules in variations.items():
+        train_h, eval_h, agents[name] = run_full_experiment(name, **rules,
+                                                            train_episodes=TRAIN_EPISODES,
+                                                            eval_episodes=EVAL_EPISODES)
+        results[name] = (train_h, eval_h)
 
-    # 2. Fair Scaled
-    name = "Fair Scaled"
-    results[name] = run_full_experiment(name, max_hand_value=25, dealer_stick_threshold=21,
-                                        train_episodes=TRAIN_EPISODES, eval_episodes=EVAL_EPISODES)
-
-    # 3. Hard Ace
-    name = "Hard Ace"
-    results[name] = run_full_experiment(name, max_hand_value=21, force_ace_value=1,
-                                        train_episodes=TRAIN_EPISODES, eval_episodes=EVAL_EPISODES)
-
-    print(f"\n{'=' * 70}")
-    print(f"{'EXPERIMENT':<20} | {'FINAL WIN RATE':<15} | {'AVG REWARD':<15}")
-    print(f"{'-' * 70}")
+    print(f"\n{'=' * 85}")
+    print(f"{'EXPERIMENT':<20} | {'FINAL WIN RATE':<15} | {'AVG REWARD':<15} | {'DEALER BUST (EXACT)':<20}")
+    print(f"{'-' * 85}")
     for name, (train_h, eval_h) in results.items():
         # Average of the last few evaluation points for robustness
         final_wr = sum(eval_h['win_rates'][-5:]) / 5
         final_rw = sum(eval_h['rewards'][-5:]) / 5
-        print(f"{name:<20} | {final_wr:.2%}        | {final_rw:.4f}")
-    print(f"{'=' * 70}\n")
+        bust_rate = exact_dealer_bust_rate(**variations[name])
+        print(f"{name:<20} | {final_wr:.2%}        | {final_rw:.4f}          | {bust_rate:.2%}")
+    print(f"{'=' * 85}\n")
+
+    # Paired comparison: every variation plays the same pre-dealt cards
+    paired = compare_policies(list(agents.values()), num_games=EVAL_EPISODES * 10, seed=0)
+    print(f"{'EXPERIMENT':<20} | {'AVG REWARD (CRN)':<17} | {'DIFF VS BASELINE':<25}")
+    print(f"{'-' * 85}")
+    for name, summary in zip(agents, paired):
+        diff = f"{summary['reward_diff']:+.4f} ± {summary['reward_diff_se']:.4f}"
+        print(f"{name:<20} | {summary['avg_reward']:.4f}            | {diff}")
+    print(f"{'=' * 85}\n")
 
     os.makedirs('figures', exist_ok=True)
     plot_combined_results(results, train_end_point=TRAIN_EPISODES,
@@ -6,9 +6,31 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from blackjack_lib.agents.Q_agent import QAgent
+from blackjack_lib.agents.search import successive_halving, hyperband
 import pandas as pd
 from simulate_Q import evaluate_win_rate, evaluate_Q, plot_training_evaluation_performance
 
+def print_results_summary(df, total_time, footer=()):
+    """Print the ranked results table and the best row of ``df``; returns that row."""
+    print(f"\n{'='*80}")
+    print("RESULTS SUMMARY")
+    print(f"{'='*80}")
+    print(df.to_string(index=False))
+    print(f"{'='*80}\n")
+    
+    best_params = df.iloc[0]
+    print("Best Hyperparameters:")
+    print(f"  Discount (γ): {best_params['Discount']:.2f}")
+    print(f"  Epsilon (ε): {best_params['Epsilon']:.2f}")
+    print(f"  Learning Rate Base: {best_params['LR_Base']:.1f}")
+    print(f"  Win Rate: {best_params['Win_Rate']:.4f} ({best_params['Win_Rate']*100:.2f}%)")
+    print(f"\nTotal Search Time: {total_time:.2f}s ({total_time/60:.2f} minutes)")
+    for line in footer:
+        print(line)
+    print(f"{'='*80}\n")
+    
+    return best_params
+
 def hyperparameter_search(discounts=[0.9, 0.95, 0.99], 
                          epsilons=[0.1, 0.2, 0.4, 0.6],
                          lr_bases=[5.0, 10.0, 20.0],
@@ -66,21 +88,61 @@ def hyperparameter_search(discounts=[0.9, 0.95, 0.99],
     df = pd.DataFrame(results)
     df = df.sort_values('Win_Rate', ascending=False)
     
+    best_params = print_results_summary(
+        df, total_time, [f"Average Time per Combination: {total_time/total_combinations:.2f}s"])
+    
+    return df, best_params
+
+def successive_halving_search(discounts=[0.9, 0.95, 0.99],
+                              epsilons=[0.1, 0.2, 0.4, 0.6],
+                              lr_bases=[5.0, 10.0, 20.0],
+                              min_train=5000,
+                              num_train=50000,
+                              eta=3,
+                              num_eval=10000,
+                              num_workers=None,
+                              use_hyperband=False,
+                              common_random_numbers=True,
+                              seed=0,
+                              verbose=True):
+    
+    configs = [{'discount': discount, 'epsilon': epsilon, 'lr_base': lr_base}
+               for discount in discounts for epsilon in epsilons for lr_base in lr_bases]
+    
     print(f"\n{'='*80}")
-    print(f"RESULTS SUMMARY")
+    print(f"{'HYPERBAND' if use_hyperband else 'SUCCESSIVE HALVING'} HYPERPARAMETER SEARCH")
     print(f"{'='*80}")
-    print(df.to_string(index=False))
+    print(f"Total combinations: {len(configs)}")
+    print(f"Training Budget: {min_train:,} -> {num_train:,} games (eta={eta})")
+    print(f"Evaluation Games per Rung: {num_eval:,}"
+          f"{' (common random numbers)' if common_random_numbers else ''}")
     print(f"{'='*80}\n")
     
-    best_params = df.iloc[0]
-    print(f"Best Hyperparameters:")
-    print(f"  Discount (γ): {best_params['Discount']:.2f}")
-    print(f"  Epsilon (ε): {best_params['Epsilon']:.2f}")
-    print(f"  Learning Rate Base: {best_params['LR_Base']:.1f}")
-    print(f"  Win Rate: {best_params['Win_Rate']:.4f} ({best_params['Win_Rate']*100:.2f}%)")
-    print(f"\nTotal Search Time: {total_time:.2f}s ({total_time/60:.2f} minutes)")
-    print(f"Average Time per Combination: {total_time/total_combinations:.2f}s")
-    print(f"{'='*80}\n")
+    start_time = time.time()
+    search = hyperband if use_hyperband else successive_halving
+    records = search(configs, min_budget=min_train, max_budget=num_train, eta=eta,
+                     num_eval=num_eval, num_workers=num_workers, seed=seed, verbose=verbose,
+                     common_random_numbers=common_random_numbers)
+    total_time = time.time() - start_time
+    
+    df = pd.DataFrame([{
+        'Discount': r['discount'],
+        'Epsilon': r['epsilon'],
+        'LR_Base': r['lr_base'],
+        'Win_Rate': r['win_rate'],
+        'Budget': r['budget'],
+        'Rung': r['rung'],
+        'Bracket': r['bracket'],
+        'Train_Time': r['train_time'],
+        'Eval_Time': r['eval_time'],
+        'Time': r['train_time'] + r['eval_time'],
+    } for r in records])
+    # Win rates are only comparable at equal budgets, so fully trained configs rank first
+    df = df.sort_values(['Budget', 'Win_Rate'], ascending=False)
+    
+    best_params = print_results_summary(
+        df, total_time, [f"Training Games Used: {df['Budget'].sum():,} "
+                         f"(full grid: {len(configs) * num_train:,})"])
     
     return df, best_params
 
@@ -111,13 +173,14 @@ def plot_best_hyperparameters(best_params, num_train=50000, num_eval=10000,
                                         lr_base=best_params['LR_Base'])
 
 if __name__ == "__main__":
-    df_results, best = hyperparameter_search(
+    df_results, best = successive_halving_search(
         discounts=[0.9, 0.95, 0.99],
         epsilons=[0.1, 0.2, 0.4, 0.6],
         lr_bases=[5.0, 10.0, 20.0],
+        min_train=5000,
         num_train=50000,
-        num_eval=10000,
-        train_eval_interval=1000
+        eta=3,
+        num_eval=10000
     )
     
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
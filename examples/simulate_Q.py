@@ -5,74 +5,20 @@ import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from blackjack_lib.agents.Q_agent import QAgent
+from blackjack_lib.agents.evaluation import evaluate_policy, sequential_evaluate
 import matplotlib.pyplot as plt
 
 def evaluate_Q(agent, num_games=10000, track_performance=False):
-    results = {
-        'wins': 0,
-        'losses': 0,
-        'draws': 0,
-        'player_busts': 0,
-        'dealer_busts': 0
-    }
-    
-    eval_history = {
-        'game_numbers': [],
-        'win_rates': [],
-        'rewards': []
-    }
-    
-    eval_window_wins = 0
-    eval_window_rewards = 0
-    eval_window_games = 0
     eval_interval = max(100, num_games // 100)
 
     print(f"\n{'='*60}")
     print(f"Simulating {num_games} games with Q-Agent")
     print(f"{'='*60}\n")
 
-    for game_idx in range(num_games):
-        state = agent.env.reset()
-        done = False
-        episode_reward = 0
-        
-        while not done:
-            action = agent.pick_action(state, epsilon=0.0) 
-            state, reward, done, info = agent.env.step(action)
-            episode_reward += reward
-            
-        result = info['result']
-        if result == 'player_bust':
-            results['losses'] += 1
-            results['player_busts'] += 1
-        elif result == 'dealer_bust':
-            results['wins'] += 1
-            results['dealer_busts'] += 1
-        elif result == 'player_win':
-            results['wins'] += 1
-        elif result == 'dealer_win':
-            results['losses'] += 1
-        else:
-            results['draws'] += 1
-        
-        if track_performance:
-            eval_window_games += 1
-            eval_window_rewards += episode_reward
-            if episode_reward > 0:
-                eval_window_wins += 1
-            
-            if eval_window_games >= eval_interval:
-                win_rate = eval_window_wins / eval_window_games
-                avg_reward = eval_window_rewards / eval_window_games
-                
-                eval_history['game_numbers'].append(game_idx + 1)
-                eval_history['win_rates'].append(win_rate)
-                eval_history['rewards'].append(avg_reward)
-                
-                eval_window_wins = 0
-                eval_window_rewards = 0
-                eval_window_games = 0
-            
+    results = evaluate_policy(agent, num_games=num_games,
+                              eval_interval=eval_interval if track_performance else None)
+    eval_history = results.get('history')
+
     print(f"\n{'='*60}")
     print(f"STATISTICS ({num_games} games)")
     print(f"{'='*60}")
@@ -157,17 +103,12 @@ def plot_training_evaluation_performance(agent, eval_history, num_train, num_eva
     
     plt.show()
 
-def evaluate_win_rate(agent, num_games=10000):
-    wins = 0
-    for _ in range(num_games):
-        state = agent.env.reset()
-        done = False
-        while not done:
-            action = agent.pick_action(state, epsilon=0.0)
-            state, reward, done, info = agent.env.step(action)
-        if reward > 0:
-            wins += 1
-    return wins / num_games
+def evaluate_win_rate(agent, num_games=10000, half_width=None):
+    # With half_width, stop early once the 95% CI is that tight (num_games is then the cap)
+    if half_width is not None:
+        return sequential_evaluate(agent, half_width=half_width, max_games=num_games,
+                                   batch_size=min(num_games, 2000))['win_rate']
+    return evaluate_policy(agent, num_games=num_games)['win_rate']
 
 def train_evaluate_Q(num_train=50000, num_eval=10000, track_performance=True, 
                      train_eval_interval=1000, epsilon=0.4, discount=0.95, lr_base=10.0,